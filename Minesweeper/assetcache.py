@@ -0,0 +1,102 @@
+import os
+import struct
+import pygame
+from utilities import write_atomically
+
+
+class AssetCache:
+    """Class which object loads pictures scaled to required sizes and converted to display format,
+        scaled pixels are kept in files of cache directory and used as long as their version,
+        size and modification time of source file match, loaded pictures are also kept in memory"""
+
+    VERSION = 1
+    HEADER = struct.Struct('<4sIqII?')
+    MAGIC = b'MSAC'
+
+    def __init__(self, directory):
+        self.__directory = directory
+        self.__loaded = {}
+        self.__sources = {}
+        self.__hits = 0
+        self.__misses = 0
+
+    def __get_path(self, source, size, smooth, alpha, base):
+        """Returns path of cache file of picture from source file prepared with given parameters"""
+        name = os.path.splitext(os.path.basename(source))[0]
+        size = '{}x{}'.format(*size) if size is not None else 'original'
+        if base is not None:
+            size += '_from_{}x{}'.format(*base)
+        return os.path.join(self.__directory, '{}_{}_{}_{}.v{}.raw'.format(
+            name, size, 'smooth' if smooth else 'fast', 'rgba' if alpha else 'rgb', self.VERSION))
+
+    def __read(self, path, mtime, alpha):
+        """Returns picture stored in cache file or None if file is missing or outdated"""
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        if len(data) < self.HEADER.size:
+            return None
+        magic, version, sourceMtime, width, height, hasAlpha = self.HEADER.unpack_from(data)
+        pixels = data[self.HEADER.size:]
+        if magic != self.MAGIC or version != self.VERSION or sourceMtime != mtime or hasAlpha != alpha \
+                or len(pixels) != width * height * (4 if alpha else 3):
+            return None
+        return pygame.image.frombytes(pixels, (width, height), 'RGBA' if alpha else 'RGB')
+
+    def __write(self, path, mtime, surface, alpha):
+        """Stores picture in cache file, replacing it at once so that readers never see partial file"""
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, mtime, surface.get_width(), surface.get_height(), alpha)
+        try:
+            os.makedirs(self.__directory, exist_ok=True)
+            write_atomically(path, header + pygame.image.tobytes(surface, 'RGBA' if alpha else 'RGB'))
+        except OSError:
+            pass
+
+    def __get_source(self, source, alpha):
+        """Returns decoded picture of source file, decoding it once for all sizes loaded until sources are released"""
+        key = source, alpha
+        if key not in self.__sources:
+            surface = pygame.image.load(source)
+            if alpha:
+                picture = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+                picture.blit(surface, (0, 0))
+                surface = picture
+            self.__sources[key] = surface
+        return self.__sources[key]
+
+    def load(self, source, size=None, smooth=True, alpha=True, base=None):
+        """Returns picture from source file scaled to given size, display mode has to be set before,
+            pictures with alpha keep transparency of source, if base size is given picture is scaled
+            from source picture loaded in that size instead of from source file"""
+        key = source, size, smooth, alpha, base
+        if key in self.__loaded:
+            return self.__loaded[key]
+
+        mtime = os.stat(source).st_mtime_ns
+        path = self.__get_path(source, size, smooth, alpha, base)
+        surface = self.__read(path, mtime, alpha)
+        if surface is None:
+            self.__misses += 1
+            surface = self.load(source, base, smooth, alpha) if base is not None else self.__get_source(source, alpha)
+            if size is not None:
+                surface = pygame.transform.smoothscale(surface, size) if smooth else \
+                    pygame.transform.scale(surface, size)
+            self.__write(path, mtime, surface, alpha)
+        else:
+            self.__hits += 1
+
+        surface = surface.convert_alpha() if alpha else surface.convert()
+        self.__loaded[key] = surface
+        return surface
+
+    def release_sources(self):
+        """Forgets decoded source pictures which are kept only while batch of sizes is loaded"""
+        self.__sources = {}
+
+    def get_hits(self):
+        return self.__hits
+
+    def get_misses(self):
+        return self.__misses
@@ -0,0 +1,34 @@
+import os
+import threading
+import pygame
+
+
+class SoundLibrary:
+    """Class which object loads sound effects on background thread once sound is enabled,
+        mixer is started only then and effects which are not loaded yet are skipped when played"""
+    def __init__(self, directory):
+        self.__directory = directory
+        self.__sounds = {}
+        self.__thread = None
+
+    def __load(self):
+        """Starts mixer and loads all .wav files of directory, leaves library silent if there is no audio device"""
+        try:
+            pygame.mixer.init()
+            for fileName in sorted(os.listdir(self.__directory)):
+                if fileName.endswith(".wav"):
+                    self.__sounds[fileName.split('.')[0]] = pygame.mixer.Sound(os.path.join(self.__directory, fileName))
+        except pygame.error:
+            pass
+
+    def start(self):
+        """Starts loading sounds in background unless it has already been started"""
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__load, daemon=True)
+            self.__thread.start()
+
+    def play(self, name):
+        """Plays sound of given name if it is already loaded"""
+        sound = self.__sounds.get(name)
+        if sound is not None:
+            sound.play()
@@ -1,205 +1,415 @@
+import math
+import numpy as np
 import pygame
+from engine import Engine, CLOSED
+from generator import NoGuessGenerator
+from replay import Replay
+from solver import Solver
 from tile import Tile
-from random import randint
-from state import GameState
-from utilities import create_background
+from state import GameState, BoardEvent
+from utilities import create_tile_atlas
+
+
+SPRITE_NAMES = ('0', '1', '2', '3', '4', '5', '6', '7', '8',
+                'blanc_tile', 'flagged_tile', 'mine', 'mine_boom', 'not_mine')
+CODES_NUMBER = 9 * 8
 
 
 class Board:
     """Class which object is responsible for depicting nad changing board state
         and handling events directed towards board"""
 
+    DIRTY_RECTS_LIMIT = 64
+
     def __init__(self, size, mines, tileSize, owner):
         self.__size = size
         self.__mines = mines
-        self.__flagsLeft = mines
-        self.__clearTilesLeft = self.__size[0] * self.__size[1] - self.__mines
 
         self.__tileSize = tileSize
         self.__owner = owner
         self.__bgColour = pygame.Color(210, 210, 210)
         self.__linesColour = pygame.Color(10, 10, 10)
-        self.__background = create_background(self.__size[0], self.__size[1], self.__tileSize,
-                                              self.__bgColour, self.__linesColour)
-        self.__grid = self.__set_grid()
+        self.__atlases = {}
+        self.__dirty = np.ones(self.__size, dtype=bool)
+        self.__engine = Engine(self.__size, self.__mines, layouts=self.__owner.get_layoutPool())
+        self.__solver = Solver(self.__engine.get_field())
+        self.__hint = None
+        self.__hintColours = {'open': pygame.Color(0, 160, 0), 'flag': pygame.Color(200, 0, 0)}
+        self.__overlay = False
+        self.__overlayVersion = None
+        self.__shades = {}
+        self.__noGuess = False
+        self.__generator = None
+        self.__pendingOpen = None
+        self.__replay = None
+        self.__watched = None
+        self.__watchedMovesNo = 0
+        self.__watchStart = None
 
         self.__startTime = None
-        self.__minesPlaced = False
-
-        self.__rect = pygame.Rect(0, 0, self.__size[0] * self.__tileSize, self.__size[1] * self.__tileSize)
-        self.__status = GameState.waiting
-
-    def __draw_tiles(self, background):
-        """Draws tiles pictures onto board according to state of each tile"""
-        leftCorner = (0, 0)
-        for row in range(self.__size[0]):
-            for col in range(self.__size[1]):
-                tile = self.get_tile((row, col))
-                icon = self.__owner.get_tile_icon(tile)
-                background.blit(icon, leftCorner)
-                leftCorner = leftCorner[0] + self.__tileSize, leftCorner[1]
-            leftCorner = 0, leftCorner[1] + self.__tileSize
-
-    def __set_grid(self):
-        """Sets grid of size contained in class and populates it with tiles"""
-        board = []
-        x = y = 0
-        for row in range(self.__size[0]):
-            row = []
-            for col in range(self.__size[1]):
-                tile = Tile(self, (x, y))
-                row.append(tile)
-                y += 1
-            board.append(row)
-            y = 0
-            x += 1
-        return board
-
-    def __set_adjacent(self):
-        """Passes lists of adjacent tiles to each tile in the grid"""
-        for row in range(self.__size[0]):
-            for col in range(self.__size[1]):
-                tile = self.get_tile((row, col))
-                adjacent = self.__get_adjacent_tiles((row, col))
-                tile.set_adjacentTiles(adjacent)
-
-    def __get_adjacent_tiles(self, index):
-        """Generates and returns lists of tiles adjacent to one passed as argument"""
-        adjacent = []
-        for row in range(index[0] - 1, index[0] + 2):
-            for col in range(index[1] - 1, index[1] + 2):
-                isOutOfBoard = row < 0 or row >= self.__size[0] or col < 0 or col >= self.__size[1]
-                isSameTile = row == index[0] and col == index[1]
-                if not (isOutOfBoard or isSameTile):
-                    adjacent.append(self.get_tile((row, col)))
-        return adjacent
-
-    def __check_tile_open(self, tile):
-        """Changes state of tile passed as argument and takes actions according to tile contents"""
-        if tile.is_flagged():
+
+        self.__rect = pygame.Rect(0, 0, self.__size[1] * self.__tileSize, self.__size[0] * self.__tileSize)
+        self.__surface = pygame.Surface(self.__rect.size)
+        self.__camera = [0, 0]
+        self.__viewChanged = True
+        self.__drawnTilesNo = 0
+
+    def __get_atlas(self):
+        """Returns atlas of tile sprites for current zoom level, creating it at first use"""
+        if self.__tileSize not in self.__atlases:
+            icons = self.__owner.get_tile_icons(self.__tileSize)
+            self.__atlases[self.__tileSize] = create_tile_atlas([icons[name] for name in SPRITE_NAMES],
+                                                                self.__tileSize, self.__bgColour, self.__linesColour)
+        return self.__atlases[self.__tileSize]
+
+    def __get_visible_range(self):
+        """Returns first and past the last row and column of cells at least partially visible in viewport"""
+        edge = self.__tileSize
+        top = max(self.__camera[1] // edge, 0)
+        bottom = min(-(-(self.__camera[1] + self.__rect.height) // edge), self.__size[0])
+        left = max(self.__camera[0] // edge, 0)
+        right = min(-(-(self.__camera[0] + self.__rect.width) // edge), self.__size[1])
+        return top, bottom, left, right
+
+    def __clamp_camera(self):
+        """Keeps viewport within board or centers board in viewport if it is smaller"""
+        boardSize = self.__size[1] * self.__tileSize, self.__size[0] * self.__tileSize
+        for axis in range(2):
+            if boardSize[axis] <= self.__rect.size[axis]:
+                self.__camera[axis] = -((self.__rect.size[axis] - boardSize[axis]) // 2)
+            else:
+                self.__camera[axis] = min(max(self.__camera[axis], 0), boardSize[axis] - self.__rect.size[axis])
+        self.__viewChanged = True
+
+    def __get_shade(self, level):
+        """Returns translucent tile sized surface marking mine probability of given level from 1 to 10"""
+        key = self.__tileSize, level
+        if key not in self.__shades:
+            shade = pygame.Surface((self.__tileSize, self.__tileSize), pygame.SRCALPHA)
+            shade.fill((255, 0, 0, 18 * level))
+            self.__shades[key] = shade
+        return self.__shades[key]
+
+    def __draw_overlay(self, rows, cols, rects):
+        """Shades drawn closed tiles according to their probability of being mine"""
+        field = self.__engine.get_field()
+        closed = field.get_observation()[rows, cols] == CLOSED
+        probabilities, other = self.__solver.get_probabilities()
+        shades = []
+        for row, col, rect in zip(rows[closed].tolist(), cols[closed].tolist(), np.array(rects)[closed].tolist()):
+            level = round(10 * probabilities.get((row, col), other))
+            if level > 0:
+                shades.append((self.__get_shade(level), rect))
+        self.__surface.blits(shades, False)
+
+    def __draw_tiles(self):
+        """Draws pictures of visible tiles changed since last call onto retained viewport surface
+            and returns rectangles of redrawn tiles relative to viewport"""
+        top, bottom, left, right = self.__get_visible_range()
+        if self.__viewChanged:
+            self.__surface.fill(self.__bgColour)
+            self.__dirty[top:bottom, left:right] = True
+            self.__viewChanged = False
+
+        rows, cols = np.nonzero(self.__dirty[top:bottom, left:right])
+        rows += top
+        cols += left
+        codes = self.__engine.get_field().get_codes((rows, cols))
+        sprites = self.__owner.get_sprite_table(self.__engine.get_status())[codes]
+        edge = self.__tileSize
+        x, y = self.__camera
+        rects = [pygame.Rect(col * edge - x, row * edge - y, edge, edge)
+                 for row, col in zip(rows.tolist(), cols.tolist())]
+        atlas = self.__get_atlas()
+        self.__surface.blits([(atlas, rect, (sprite * edge, 0, edge, edge))
+                              for rect, sprite in zip(rects, sprites.tolist())], False)
+        if self.__overlay and self.__engine.get_status() == GameState.running and rects:
+            self.__draw_overlay(rows, cols, rects)
+        if self.__hint is not None and self.__dirty[self.__hint[1], self.__hint[2]]:
+            hintRect = pygame.Rect(self.__hint[2] * edge - x, self.__hint[1] * edge - y, edge, edge)
+            pygame.draw.rect(self.__surface, self.__hintColours[self.__hint[0]], hintRect, max(edge // 10, 1))
+        self.__dirty.fill(False)
+        return rects
+
+    def __get_index_under_mouse(self):
+        """Returns index of tile under mouse cursor or None if cursor is outside of board"""
+        xm, ym = pygame.mouse.get_pos()
+        if not self.__rect.collidepoint(xm, ym):
+            return None
+        i = (ym - self.__rect.top + self.__camera[1]) // self.__tileSize
+        j = (xm - self.__rect.left + self.__camera[0]) // self.__tileSize
+        if i < 0 or i >= self.__size[0] or j < 0 or j >= self.__size[1]:
+            return None
+        return i, j
+
+    def __move(self, action, index, time=None):
+        """Makes move of given action on tile of given index at given time in milliseconds, current if not set,
+            moves which change board are recorded in replay of the game, returns outcome of move"""
+        time = pygame.time.get_ticks() if time is None else time
+        outcome = getattr(self.__engine, action)(*index)
+        if self.__watched is None:
+            if BoardEvent.started in outcome.events:
+                self.__replay = Replay(self.__size, self.__mines, self.__engine.get_seed(),
+                                       self.__engine.get_safeArea())
+            if outcome.events:
+                self.__replay.record(time, action, index, self.__engine.get_field())
+        self.__apply(outcome, time)
+        return outcome
+
+    def __apply(self, outcome, time):
+        """Takes actions according to events of outcome of move made on board at given time in milliseconds"""
+        self.__dirty[outcome.changed[:, 0], outcome.changed[:, 1]] = True
+        if self.__hint is not None and outcome.events:
+            self.__dirty[self.__hint[1], self.__hint[2]] = True
+            self.__hint = None
+        if BoardEvent.opened in outcome.events:
+            self.__solver.update(outcome.changed)
+        for event in outcome.events:
+            if event == BoardEvent.started:
+                self.__startTime = time
+            elif event in [BoardEvent.flagged, BoardEvent.unflagged]:
+                self.__owner.play_sound('sound_flag')
+            elif event == BoardEvent.exploded:
+                self.__owner.play_sound('sound_boom')
+                self.__dirty.fill(True)
+                if self.__watched is None:
+                    self.__owner.handle_defeat()
+            elif event == BoardEvent.won:
+                self.__dirty.fill(True)
+                self.__owner.get_timer().set_value((time - self.__startTime) / 1000)
+                if self.__watched is None:
+                    self.__owner.handle_victory()
+
+    def draw(self, surface, full=False):
+        """Draws board content visible in viewport and changed since last call onto passed surface,
+            whole viewport if full is set, returns list of rectangles of passed surface that were updated"""
+        if self.__overlay and self.__overlayVersion != self.__solver.get_version():
+            self.__overlayVersion = self.__solver.get_version()
+            self.__viewChanged = True
+        full = full or self.__viewChanged
+        rects = self.__draw_tiles()
+        self.__drawnTilesNo = len(rects)
+        if full or len(rects) > self.DIRTY_RECTS_LIMIT:
+            surface.blit(self.__surface, self.__rect)
+            return [self.__rect.copy()]
+
+        for rect in rects:
+            surface.blit(self.__surface, rect.move(self.__rect.topleft), rect)
+        return [rect.move(self.__rect.topleft).clip(self.__rect) for rect in rects]
+
+    def show_hint(self):
+        """Marks tile of next move which is certain to be right, scrolling view to it if necessary"""
+        if self.__engine.get_status() != GameState.running:
             return
-        if tile.is_mine():
-            if self.__owner.is_sound_on():
-                self.__owner.get_sounds()['sound_boom'].play()
-            self.__change_status(GameState.lost)
-            tile.click()
+        self.__hint = self.__solver.next_move()
+        if self.__hint is None:
             return
-        if not tile.is_clicked():
-            if self.__status == GameState.waiting:
-                self.__place_mines(tile)
-                self.__startTime = pygame.time.get_ticks()
-                self.__change_status(GameState.running)
-            self.__open_tiles(tile)
-
-    def __open_tiles(self, tile):
-        """Recursively clicks all tiles surrounding one passed as argument if the do not contain mines"""
-        tile.click()
-        self.__clearTilesLeft -= 1
-        if tile.get_minesAroundNo() != 0:
+        self.__dirty[self.__hint[1], self.__hint[2]] = True
+        top, bottom, left, right = self.__get_visible_range()
+        if not (top <= self.__hint[1] < bottom and left <= self.__hint[2] < right):
+            self.__camera[0] = self.__hint[2] * self.__tileSize - self.__rect.width // 2
+            self.__camera[1] = self.__hint[1] * self.__tileSize - self.__rect.height // 2
+            self.__clamp_camera()
+
+    def toggle_overlay(self):
+        """Switches on or off shading of closed tiles according to their probability of being mine"""
+        self.__overlay = not self.__overlay
+        self.__overlayVersion = None
+        self.__viewChanged = True
+
+    def auto_solve(self):
+        """Makes all moves which are certain to be right until none is left or one changes nothing"""
+        if self.__watched is not None:
             return
-        for adjacent in tile.get_adjacentTiles():
-            if not adjacent.is_mine() and not adjacent.is_clicked() and not adjacent.is_flagged():
-                self.__open_tiles(adjacent)
-
-    def __change_status(self, newStatus):
-        self.__status = newStatus
-
-    def __place_mines(self, tile):
-        """Places mines onto random tiles excluding one passed as parameter and ones already containing mine"""
-        for n in range(self.__mines):
-            while True:
-                x = randint(0, self.__size[0] - 1)
-                y = randint(0, self.__size[1] - 1)
-                if not (self.get_tile((x, y)).is_mine()) and\
-                        not (tile.get_position()[0] == x and tile.get_position()[1] == y):
-                    self.get_tile((x, y)).set_mine()
-                    break
-        self.__minesPlaced = True
-        self.__set_adjacent()
-
-    def __check_if_won(self):
-        """Checks for victory condition and changes state of the board accordingly"""
-        if self.__clearTilesLeft == 0:
-            self.__change_status(GameState.won)
-            self.__flagsLeft = 0
-            self.__owner.handle_victory()
-
-    def draw(self, surface):
-        """Draws board content onto passed surface"""
-        background = self.__background.copy()
-        self.__draw_tiles(background)
-        surface.blit(background, self.__rect)
+        while self.__engine.get_status() == GameState.running:
+            move = self.__solver.next_move()
+            if move is None:
+                break
+            if not self.__move(move[0], move[1:]).events:
+                break  # no flags left for deduced mine, solver would propose it again
+
+    def scroll(self, dx, dy):
+        """Moves viewport by given number of pixels"""
+        self.__camera[0] += dx
+        self.__camera[1] += dy
+        self.__clamp_camera()
+
+    def zoom(self, step, anchor):
+        """Changes tile size by given number of zoom levels keeping board point under anchor in place"""
+        levels = self.__owner.ZOOM_LEVELS
+        level = min(max(levels.index(self.__tileSize) + step, 0), len(levels) - 1)
+        if levels[level] == self.__tileSize:
+            return
+        for axis in range(2):
+            shift = anchor[axis] - self.__rect.topleft[axis]
+            self.__camera[axis] = (self.__camera[axis] + shift) * levels[level] // self.__tileSize - shift
+        self.__tileSize = levels[level]
+        self.__clamp_camera()
+
+    def set_view_size(self, size):
+        """Changes size of viewport through which board is seen"""
+        self.__rect.size = size
+        self.__surface = pygame.Surface(size)
+        self.__clamp_camera()
+
+    def __open(self, index):
+        """Opens tile of given index, in no guessing mode first move waits for solvable layout to be found"""
+        if self.__pendingOpen is not None:
+            return
+        if self.__noGuess and self.__engine.get_status() == GameState.waiting:
+            if self.__generator is None:
+                self.__generator = NoGuessGenerator()
+            self.__generator.start(self.__size, self.__mines, index)
+            self.__pendingOpen = index
+            return
+        self.__move('open', index)
+
+    def __play_watched(self):
+        """Makes moves of watched replay whose time has come, returns whether board has changed"""
+        moves = self.__watched.get_moves()
+        now = pygame.time.get_ticks() - self.__watchStart
+        changed = False
+        while self.__watchedMovesNo < len(moves) and moves[self.__watchedMovesNo][0] <= now:
+            time, action, index = moves[self.__watchedMovesNo]
+            self.__watchedMovesNo += 1
+            self.__move(action, index, self.__watchStart + time)
+            changed = True
+        return changed
+
+    def watch(self, replay):
+        """Starts playing replay in real time, mouse moves are ignored until board is reset"""
+        self.reset(replay.get_size(), replay.get_mines(), replay.get_seed())
+        self.__engine.set_safeArea(replay.get_safeArea())
+        self.__watched = replay
+        self.__watchedMovesNo = 0
+        self.__watchStart = pygame.time.get_ticks()
+
+    def resume(self, saved):
+        """Continues game in progress read from save file"""
+        self.reset(saved.size, saved.mines)
+        self.__engine.set_safeArea(saved.safeArea)
+        self.__engine.restore(*saved.planes, seed=saved.seed)
+        self.__solver.rebuild()
+        self.__startTime = pygame.time.get_ticks() - saved.elapsed
+        self.__replay = saved.replay
+        self.__replay.set_startTime(self.__startTime)
+
+    def seek(self, time):
+        """Shows state of watched game at given number of milliseconds since its first move
+            and plays it on from there"""
+        time = min(max(int(time), 0), self.__watched.get_duration())
+        self.__watched.seek(time, self.__engine)
+        self.__solver.rebuild()
+        self.__hint = None
+        self.__dirty.fill(True)
+        self.__watchedMovesNo = self.__watched.count_moves(time)
+        self.__watchStart = pygame.time.get_ticks() - time
+        self.__startTime = self.__watchStart
+        self.__owner.get_timer().set_value(time / 1000)
+
+    def update(self):
+        """Makes first move of no guessing game once search for its layout has finished
+            and moves of watched replay, returns whether board has changed"""
+        if self.__watched is not None:
+            return self.__play_watched()
+        if self.__pendingOpen is None:
+            return False
+        result = self.__generator.poll()
+        if result is None:
+            return False
+        index, self.__pendingOpen = self.__pendingOpen, None
+        self.__engine.reset(seed=result[0])
+        self.__move('open', index)
+        return True
+
+    def is_generating(self):
+        return self.__pendingOpen is not None
+
+    def is_watching(self):
+        return self.__watched is not None
+
+    def is_playing(self):
+        """Checks if watched replay has moves left to be played"""
+        return self.__watched is not None and self.__watchedMovesNo < len(self.__watched.get_moves())
+
+    def get_watchedTime(self):
+        """Returns number of milliseconds of watched game which have been played"""
+        return min(pygame.time.get_ticks() - self.__watchStart, self.__watched.get_duration())
+
+    def get_watchedDuration(self):
+        return self.__watched.get_duration()
+
+    def set_noGuess(self, noGuess):
+        """Switches generation of mines layouts which can be cleared without guessing, used from next game,
+            layout being searched for keeps safe area it was proved solvable with"""
+        self.__noGuess = noGuess
+        if self.__engine.get_status() == GameState.waiting and not self.is_generating():
+            self.__engine.set_safeArea(noGuess)
+
+    def shutdown(self):
+        """Stops background work of board"""
+        if self.__generator is not None:
+            self.__generator.shutdown()
 
     def handle_mouse_down(self, button):
         """Handles event of mouse button being pressed down"""
-        if self.__status in [GameState.waiting, GameState.won, GameState.lost]:
+        if self.__watched is not None:
             return
-
         if button == 3:  # RMB
-            xm, ym = pygame.mouse.get_pos()
-            xc, yc = self.__rect.topleft
-            i = (ym - yc) // self.__tileSize
-            j = (xm - xc) // self.__tileSize
-            if i < 0 or i >= self.__size[0]:
-                i = None
-            if j < 0 or j >= self.__size[1]:
-                j = None
-
-            if j is not None and i is not None:
-                tile = self.get_tile((i, j))
-                if not tile.is_clicked():
-                    if tile.is_flagged():
-                        if self.__owner.is_sound_on():
-                            self.__owner.get_sounds()['sound_flag'].play()
-                        tile.toggle_flag()
-                        self.__flagsLeft += 1
-                    elif not self.__flagsLeft == 0:
-                        if self.__owner.is_sound_on():
-                            self.__owner.get_sounds()['sound_flag'].play()
-                        tile.toggle_flag()
-                        self.__flagsLeft -= 1
+            index = self.__get_index_under_mouse()
+            if index is not None:
+                self.__move('flag', index)
 
     def handle_mouse_up(self, button):
         """Handles event of mouse button being let go from pressed state"""
-        if self.__status in [GameState.won, GameState.lost]:
+        if self.__watched is not None:
             return
-
         if button == 1:  # LMB
-            xm, ym = pygame.mouse.get_pos()
-            xc, yc = self.__rect.topleft
-            i = (ym - yc) // self.__tileSize
-            j = (xm - xc) // self.__tileSize
-            if i < 0 or i >= self.__size[0]:
-                i = None
-            if j < 0 or j >= self.__size[1]:
-                j = None
-            if j is not None and i is not None:
-                tile = self.get_tile((i, j))
-                self.__check_tile_open(tile)
-                self.__check_if_won()
-
-    def reset(self, size=None, mines=None):
-        """Resets board state to pre game start optionally changing board size and amount of mines"""
-        if self.__owner.is_sound_on():
-            self.__owner.get_sounds()['sound_reset'].play()
+            index = self.__get_index_under_mouse()
+            if index is not None:
+                self.__open(index)
+        elif button == 2:  # MMB
+            index = self.__get_index_under_mouse()
+            if index is not None:
+                self.__move('chord', index)
+
+    def reset(self, size=None, mines=None, seed=None):
+        """Resets board state to pre game start optionally changing board size and amount of mines,
+            seed makes mines layout of next game reproducible"""
+        self.__owner.play_sound('sound_reset')
 
         if size is not None:
             self.__size = size
         if mines is not None:
             self.__mines = mines
-        self.__flagsLeft = self.__mines
-        self.__clearTilesLeft = self.__size[0] * self.__size[1] - self.__mines
-        self.__background = create_background(self.__size[0], self.__size[1], self.__tileSize,
-                                              self.__bgColour, self.__linesColour)
-        self.__grid = self.__set_grid()
+        self.__dirty = np.ones(self.__size, dtype=bool)
+        if self.__generator is not None:
+            self.__generator.cancel()
+        self.__pendingOpen = None
+        self.__replay = None
+        self.__watched = None
+        self.__engine.set_safeArea(self.__noGuess)
+        self.__engine.reset(self.__size, self.__mines, seed)
+        self.__solver.rebuild()
+        self.__hint = None
+        self.__clamp_camera()
         self.__startTime = None
-        self.__minesPlaced = False
-        self.__status = GameState.waiting
 
         self.__owner.get_timer().set_value(0)
 
+    def get_replay(self):
+        return self.__replay
+
+    def get_time(self):
+        """Returns number of started seconds between first and last move of game"""
+        return math.ceil(self.__replay.get_duration() / 1000) if self.__replay is not None else 0
+
     def get_flagsLeft(self):
-        return self.__flagsLeft
+        return self.__engine.get_flagsLeft()
+
+    def get_drawnTilesNo(self):
+        """Returns number of tiles redrawn by last call of draw"""
+        return self.__drawnTilesNo
 
     def get_startTime(self):
         return self.__startTime
@@ -208,7 +418,10 @@ class Board:
         return self.__rect
 
     def get_status(self):
-        return self.__status
+        return self.__engine.get_status()
+
+    def get_engine(self):
+        return self.__engine
 
     def get_tile(self, index):
-        return self.__grid[index[0]][index[1]]
+        return Tile(self.__engine.get_field(), (index[0], index[1]))
@@ -0,0 +1,356 @@
+import numpy as np
+from collections import namedtuple
+from state import GameState, BoardEvent
+
+DIFFICULTIES = {
+    'BEGINNER': ((9, 9), 10),
+    'INTERMEDIATE': ((16, 16), 40),
+    'ADVANCED': ((16, 30), 99),
+}
+
+CLOSED = -1
+FLAGGED = -2
+EXPLODED = -3
+
+ADJACENT_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def count_adjacent(plane):
+    """Returns array holding for every cell number of adjacent cells set in passed boolean plane"""
+    rows, cols = plane.shape
+    padded = np.zeros((rows + 2, cols + 2), dtype=np.uint8)
+    padded[1:-1, 1:-1] = plane
+    counts = np.zeros((rows, cols), dtype=np.uint8)
+    for rowShift, colShift in ADJACENT_OFFSETS:
+        counts += padded[1 + rowShift:1 + rowShift + rows, 1 + colShift:1 + colShift + cols]
+    return counts
+
+
+Layout = namedtuple('Layout', ['seed', 'sample', 'mines', 'minesAround'])
+
+
+def get_spare(size, mines, safeArea):
+    """Returns number of cells sampled beyond amount of mines so that ones excluded by first move can be dropped"""
+    return min(len(ADJACENT_OFFSETS) + 1 if safeArea else 1, size[0] * size[1] - mines)
+
+
+def create_layout(size, mines, seed, spare):
+    """Samples mines layout of given seed without knowing first move, mines are placed on leading cells of sample,
+        spare cells following them replace ones excluded once first move is made"""
+    rows, cols = size
+    sample = np.random.default_rng(seed).choice(rows * cols, mines + spare, replace=False)
+    minesPlane = np.zeros(size, dtype=bool)
+    minesPlane.ravel()[sample[:mines]] = True
+    return Layout(seed, sample, minesPlane, count_adjacent(minesPlane))
+
+
+class Field:
+    """Class which object keeps state of all board cells in compact planes
+        (one byte per cell for each of mine, opened, flagged and mines around)"""
+
+    def __init__(self, size, mines):
+        self.__size = size
+        self.__minesNo = mines
+        self.__seed = None
+        self.__mines = None
+        self.__opened = None
+        self.__flagged = None
+        self.__minesAround = None
+        self.reset()
+
+    def reset(self, size=None, mines=None):
+        """Clears all planes optionally changing board size and amount of mines"""
+        if size is not None:
+            self.__size = size
+        if mines is not None:
+            self.__minesNo = mines
+        self.__seed = None
+        self.__mines = np.zeros(self.__size, dtype=bool)
+        self.__opened = np.zeros(self.__size, dtype=bool)
+        self.__flagged = np.zeros(self.__size, dtype=bool)
+        self.__minesAround = np.zeros(self.__size, dtype=np.uint8)
+
+    def place_mines(self, index, seed=None, safeArea=False, layout=None):
+        """Places mines onto cells sampled without replacement, excluding one of given index
+            and optionally, if board has room for it, cells adjacent to it,
+            layout prepared in advance by create_layout may be passed instead of seed"""
+        rows, cols = self.__size
+        excluded = [index[0] * cols + index[1]]
+        if safeArea:
+            area = [row * cols + col for row, col in self.get_adjacent(index)] + excluded
+            if rows * cols - len(area) >= self.__minesNo:
+                excluded = area
+        if self.__minesNo > rows * cols - len(excluded):
+            raise ValueError("Board of size {}x{} cannot hold {} mines".format(rows, cols, self.__minesNo))
+
+        if layout is None:
+            seed = seed if seed is not None else int(np.random.default_rng().integers(2 ** 32))
+            layout = create_layout(self.__size, self.__minesNo, seed, get_spare(self.__size, self.__minesNo, safeArea))
+        self.__seed = layout.seed
+        self.__mines = layout.mines
+        self.__minesAround = layout.minesAround
+
+        # at most nine cells are excluded, so only they and as many spare cells are looked at
+        removed = [cell for cell in excluded if self.__mines.flat[cell]]
+        spare = layout.sample[self.__minesNo:self.__minesNo + len(removed) + len(excluded)]
+        added = spare[~np.isin(spare, excluded)][:len(removed)]
+        for cell in removed:
+            row, col = divmod(cell, cols)
+            self.__mines[row, col] = False
+            self.__minesAround[max(row - 1, 0):row + 2, max(col - 1, 0):col + 2] -= 1
+            self.__minesAround[row:row + 1, col:col + 1] += 1
+        for cell in added.tolist():
+            row, col = divmod(cell, cols)
+            self.__mines[row, col] = True
+            self.__minesAround[max(row - 1, 0):row + 2, max(col - 1, 0):col + 2] += 1
+            self.__minesAround[row:row + 1, col:col + 1] -= 1
+
+    def set_planes(self, mines, opened, flagged, seed=None):
+        """Replaces state of all cells with given planes and counts numbers of adjacent mines again,
+            seed of mines layout is kept unless new one is given"""
+        if seed is not None:
+            self.__seed = seed
+        self.__mines = np.array(mines, dtype=bool)
+        self.__opened = np.array(opened, dtype=bool)
+        self.__flagged = np.array(flagged, dtype=bool)
+        self.__minesAround = count_adjacent(self.__mines)
+
+    def get_planes(self):
+        """Returns planes of mines, opened and flagged cells, they must not be changed"""
+        return self.__mines, self.__opened, self.__flagged
+
+    def set_mines(self, positions):
+        """Places mines onto cells of given positions and updates numbers of adjacent mines"""
+        for position in positions:
+            self.__mines[position] = True
+        self.__minesAround = count_adjacent(self.__mines)
+
+    def get_adjacent(self, index):
+        """Returns positions of cells adjacent to one passed as argument"""
+        rows, cols = self.__size
+        row, col = int(index[0]), int(index[1])
+        return [(row + rowShift, col + colShift) for rowShift, colShift in ADJACENT_OFFSETS
+                if 0 <= row + rowShift < rows and 0 <= col + colShift < cols]
+
+    def get_codes(self, index=None):
+        """Returns codes of visual state of cells of given index, or of all cells if it is omitted,
+            code is number of mines around plus 9, 18 and 36 for mine, opened and flagged cell respectively"""
+        if index is None:
+            index = (slice(None), slice(None))
+        codes = self.__minesAround[index].copy()
+        codes += np.uint8(9) * self.__mines[index]
+        codes += np.uint8(18) * self.__opened[index]
+        codes += np.uint8(36) * self.__flagged[index]
+        return codes
+
+    def get_observation(self):
+        """Returns array with state of cells as seen by player:
+            number of adjacent mines for opened cells, CLOSED, FLAGGED or EXPLODED otherwise"""
+        observation = self.__minesAround.astype(np.int8)
+        observation[~self.__opened] = CLOSED
+        observation[self.__flagged] = FLAGGED
+        observation[self.__opened & self.__mines] = EXPLODED
+        return observation
+
+    def is_mine(self, index):
+        return bool(self.__mines[index])
+
+    def is_opened(self, index):
+        return bool(self.__opened[index])
+
+    def is_flagged(self, index):
+        return bool(self.__flagged[index])
+
+    def get_minesAround(self, index):
+        return int(self.__minesAround[index])
+
+    def open(self, index):
+        self.__opened[index] = True
+
+    def open_region(self, index):
+        """Opens cell of given index and, if it has no adjacent mines, whole empty region around it
+            without recursion, returns array of positions of cells that were opened"""
+        if self.__opened[index]:
+            return np.empty((0, 2), dtype=np.intp)
+        if self.__minesAround[index] != 0 or self.__mines[index]:
+            self.__opened[index] = True
+            return np.array([index], dtype=np.intp)
+
+        rows, cols = self.__size
+        width = cols + 2  # flat indices refer to plane padded with one cell wide frame
+        offsets = np.array([-width - 1, -width, -width + 1, -1, 1, width - 1, width, width + 1])
+        empty = np.zeros((rows + 2, width), dtype=bool)
+        empty[1:-1, 1:-1] = (self.__minesAround == 0) & ~self.__mines & ~self.__flagged & ~self.__opened
+        empty = empty.ravel()
+
+        reached = np.zeros_like(empty)
+        order = np.zeros(empty.size, dtype=np.intp)
+        wave = np.array([(index[0] + 1) * width + index[1] + 1])
+        empty[wave] = False
+        while wave.size:
+            adjacent = (wave[:, None] + offsets).ravel()
+            reached[adjacent] = True
+            wave = adjacent[empty[adjacent]]
+            positions = np.arange(wave.size)  # drops cells reached from several sides
+            order[wave] = positions
+            wave = wave[order[wave] == positions]
+            empty[wave] = False
+
+        reached = reached.reshape(rows + 2, width)[1:-1, 1:-1] & ~self.__flagged & ~self.__opened
+        reached[index] = True
+        self.__opened |= reached
+        return np.argwhere(reached)
+
+    def toggle_flag(self, index):
+        self.__flagged[index] = not self.__flagged[index]
+
+    def get_size(self):
+        return self.__size
+
+    def get_minesNo(self):
+        return self.__minesNo
+
+    def get_seed(self):
+        return self.__seed
+
+
+Outcome = namedtuple('Outcome', ['events', 'changed'])
+Outcome.__doc__ = """Result of move made on board: list of BoardEvent and array of positions of cells that changed"""
+
+NO_CHANGE = Outcome((), np.empty((0, 2), dtype=np.intp))
+
+
+class Engine:
+    """Class which object is responsible for rules of the game played on field,
+        it does not depend on pygame and reports results of moves as returned outcomes"""
+
+    def __init__(self, size, mines, safeArea=False, layouts=None):
+        self.__field = Field(size, mines)
+        self.__safeArea = safeArea
+        self.__layouts = layouts
+        self.__seed = None
+        self.__status = GameState.waiting
+        self.__flagsLeft = mines
+        self.__clearTilesLeft = size[0] * size[1] - mines
+        if self.__layouts is not None:
+            self.__layouts.request(*self.__get_layout_kind())
+
+    def __open_cells(self, cells):
+        """Opens given cells which are neither flagged nor opened, returns events and changed positions"""
+        for row, col in cells:
+            if self.__field.is_mine((row, col)):
+                self.__field.open((row, col))
+                self.__status = GameState.lost
+                return [BoardEvent.exploded], np.array([(row, col)], dtype=np.intp)
+
+        changed = [self.__field.open_region(cell) for cell in cells]
+        changed = np.concatenate(changed) if changed else NO_CHANGE.changed
+        self.__clearTilesLeft -= len(changed)
+        events = [BoardEvent.opened]
+        if self.__clearTilesLeft == 0:
+            self.__status = GameState.won
+            self.__flagsLeft = 0
+            events.append(BoardEvent.won)
+        return events, changed
+
+    def __get_layout_kind(self):
+        """Returns size, amount of mines and number of spare cells of layouts used by game"""
+        size, mines = self.__field.get_size(), self.__field.get_minesNo()
+        return size, mines, get_spare(size, mines, self.__safeArea)
+
+    def open(self, row, col):
+        """Opens cell of given position, placing mines first if it is first move of the game"""
+        if self.__status in [GameState.won, GameState.lost]:
+            return NO_CHANGE
+        if self.__field.is_flagged((row, col)) or self.__field.is_opened((row, col)):
+            return NO_CHANGE
+
+        events = []
+        if self.__status == GameState.waiting:
+            layout = None
+            if self.__seed is None and self.__layouts is not None:
+                layout = self.__layouts.take(*self.__get_layout_kind())
+            self.__field.place_mines((row, col), self.__seed, self.__safeArea, layout)
+            self.__status = GameState.running
+            events.append(BoardEvent.started)
+        moveEvents, changed = self.__open_cells([(row, col)])
+        return Outcome(events + moveEvents, changed)
+
+    def flag(self, row, col):
+        """Toggles flag on cell of given position if game is running and there are flags left"""
+        if self.__status != GameState.running or self.__field.is_opened((row, col)):
+            return NO_CHANGE
+
+        if self.__field.is_flagged((row, col)):
+            self.__flagsLeft += 1
+            event = BoardEvent.unflagged
+        elif self.__flagsLeft != 0:
+            self.__flagsLeft -= 1
+            event = BoardEvent.flagged
+        else:
+            return NO_CHANGE
+        self.__field.toggle_flag((row, col))
+        return Outcome([event], np.array([(row, col)], dtype=np.intp))
+
+    def chord(self, row, col):
+        """Opens all not flagged cells adjacent to opened one of given position
+            if number of flags around it equals number of mines around it"""
+        if self.__status != GameState.running or not self.__field.is_opened((row, col)):
+            return NO_CHANGE
+
+        adjacent = self.__field.get_adjacent((row, col))
+        flagged = [cell for cell in adjacent if self.__field.is_flagged(cell)]
+        if len(flagged) != self.__field.get_minesAround((row, col)):
+            return NO_CHANGE
+
+        closed = [cell for cell in adjacent if not self.__field.is_flagged(cell) and not self.__field.is_opened(cell)]
+        if not closed:
+            return NO_CHANGE
+        return Outcome(*self.__open_cells(closed))
+
+    def reset(self, size=None, mines=None, seed=None):
+        """Resets game to state before first move optionally changing board size and amount of mines,
+            seed makes mines layout of next game reproducible"""
+        self.__field.reset(size, mines)
+        size = self.__field.get_size()
+        self.__seed = seed
+        self.__status = GameState.waiting
+        self.__flagsLeft = self.__field.get_minesNo()
+        self.__clearTilesLeft = size[0] * size[1] - self.__field.get_minesNo()
+        if self.__layouts is not None:
+            self.__layouts.request(*self.__get_layout_kind())
+
+    def restore(self, mines, opened, flagged, seed=None):
+        """Sets state of all cells of game in progress at once, status and counters are derived from it"""
+        self.__field.set_planes(mines, opened, flagged, seed)
+        mines, opened, flagged = self.__field.get_planes()
+        self.__flagsLeft = self.__field.get_minesNo() - int(np.count_nonzero(flagged))
+        self.__clearTilesLeft = mines.size - self.__field.get_minesNo() - int(np.count_nonzero(opened & ~mines))
+        if (opened & mines).any():
+            self.__status = GameState.lost
+        elif self.__clearTilesLeft == 0:
+            self.__status = GameState.won
+            self.__flagsLeft = 0
+        else:
+            self.__status = GameState.running
+
+    def get_field(self):
+        return self.__field
+
+    def get_status(self):
+        return self.__status
+
+    def get_flagsLeft(self):
+        return self.__flagsLeft
+
+    def get_clearTilesLeft(self):
+        return self.__clearTilesLeft
+
+    def get_seed(self):
+        return self.__field.get_seed()
+
+    def get_safeArea(self):
+        return self.__safeArea
+
+    def set_safeArea(self, safeArea):
+        self.__safeArea = safeArea
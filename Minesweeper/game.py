@@ -1,8 +1,18 @@
-import json
+import argparse
 import os
+import numpy as np
 from time import sleep
-from board import Board
-from utilities import unload_game_data, load_sounds
+from board import Board, SPRITE_NAMES, CODES_NUMBER
+from engine import DIFFICULTIES, get_spare
+from pool import LayoutPool
+from assetcache import AssetCache
+from utilities import create_minus_digit
+from persistence import GameDataStore
+from history import GameHistory
+from replay import Replay, verify_replay
+from savegame import save_game, load_game
+from profiler import FrameProfiler
+from audio import SoundLibrary
 from ui import *
 from state import *
 
@@ -11,9 +21,11 @@ class Game:
     """Class which object is responsible for controlling flow of the game and events handling"""
 
     TILE_EDGE_LEN = 30
+    ZOOM_LEVELS = (10, 15, 20, 30, 40, 60)
     FACE_EDGE_LEN = 35
     TIMER_DIG_HEIGHT = 40
     TIMER_DIG_WIDTH = 20
+    COUNTER_DIGITS_NO = 3
     SOUND_BUTTON_EDGE_LEN = 35
     LOGO_SIZE = (25, 25)
     WARNING_ICON_SIZE = (40, 40)
@@ -21,6 +33,9 @@ class Game:
     TOP_BAR_HEIGHT = 50
     TOOLBAR_HEIGHT = 50
     MARGIN_SIZE = 25
+    MAX_BOARD_AREA_WIDTH = 900
+    MAX_BOARD_AREA_HEIGHT = 600
+    SCRUBBER_HEIGHT = 8
 
     LEADERBOARD_ENTRY_LIMIT = 10
     NAME_INPUT_LEN_LIMIT = 10
@@ -34,39 +49,62 @@ class Game:
     BACKGROUND_COLOR = pygame.Color(150, 150, 150)
 
     FRAME_RATE = 30
+    BACKGROUND_POLL_TIME = 20
+    STATS_REFRESH_TIME = 250
+    STATS_BACKGROUND_COLOR = pygame.Color(0, 0, 0, 160)
 
     DATAFILE_PATH = 'assets/gameData.json'
+    HISTORY_PATH = 'assets/gameHistory.sqlite3'
+    SAVE_PATH = 'assets/savedGame.bin'
+    ASSET_CACHE_PATH = 'assets/cache'
 
-    def __init__(self):
+    def __init__(self, profilePath=None):
         self.__difficulty = 'BEGINNER'
         self.__rows = 10
         self.__cols = 10
         self.__bombs = 5
         self.__set_difficulty(self.__difficulty)
 
-        self.__leaderboardContent = {'BEGINNER': [], 'INTERMEDIATE': [], 'ADVANCED': []}
         self.__optionsOpen = False
         self.__soundOn = True
+        self.__noGuess = False
 
-        self.__read_data(unload_game_data(self.DATAFILE_PATH))
+        self.__history = GameHistory(self.HISTORY_PATH)
+        self.__lastGameId = None
+        self.__store = GameDataStore(self.DATAFILE_PATH)
+        self.__read_data(self.__store.load())
 
         self.__tileSize = self.TILE_EDGE_LEN, self.TILE_EDGE_LEN
         self.__counterSize = self.TIMER_DIG_WIDTH, self.TIMER_DIG_HEIGHT
         self.__faceSize = self.FACE_EDGE_LEN, self.FACE_EDGE_LEN
         self.__soundButtonSize = self.SOUND_BUTTON_EDGE_LEN, self.SOUND_BUTTON_EDGE_LEN
 
+        pygame.display.set_mode(self.__get_window_size())
+        self.__assetCache = AssetCache(self.ASSET_CACHE_PATH)
+        self.__tileNames = []
         self.__icons = self.__load_icons()
+        self.__tileIcons = {self.TILE_EDGE_LEN: self.__icons}
+        self.__spriteTables = self.__create_sprite_tables()
         self.__biggerFont = pygame.font.Font('assets/Lato-Black.ttf', self.BIGGER_FONT_SIZE)
         self.__smallerFont = pygame.font.Font('assets/Lato-Black.ttf', self.SMALLER_FONT_SIZE)
 
-        self.__sounds = load_sounds()
+        self.__sounds = SoundLibrary('assets/sounds')
+        if self.__soundOn:
+            self.__sounds.start()
+
+        self.__layoutPool = LayoutPool()
+        for size, mines in DIFFICULTIES.values():
+            self.__layoutPool.request(size, mines, get_spare(size, mines, False))
 
         self.__board = Board((self.__rows, self.__cols), self.__bombs, self.TILE_EDGE_LEN, self)
+        self.__board.set_noGuess(self.__noGuess)
 
         self.__screen = None
         self.__backgroundPicture = None
 
         self.__face = None
+        self.__faceIcon = None
+        self.__drawnTopBar = (None, None, None)
         self.__flagElement = None
         self.__flagCounter = None
         self.__timerElement = None
@@ -77,6 +115,9 @@ class Game:
         self.__difficultyBox = None
         self.__soundButton = None
 
+        self.__scrubber = None
+        self.__scrubberShown = False
+
         self.__leaderboard = None
         self.__returnButton = None
         self.__clearButton = None
@@ -89,50 +130,97 @@ class Game:
         self.__timeInfo = None
         self.__bravoInfo = None
 
+        self.__profilePath = profilePath
+        self.__profiler = FrameProfiler(self.FRAME_RATE, keepAll=profilePath is not None)
+        self.__statsShown = False
+        self.__statsPicture = None
+        self.__statsTime = None
+
         self.__running = None
         self.__mode = WindowMode.game
+        self.__drawnMode = None
+        self.__fullRedraw = True
 
         self.__init_screen()
+        self.__resume_game()
+
+    def __resume_game(self):
+        """Continues game left in progress when game was closed last time, save file is removed after reading
+            so that game cannot be continued twice, new game is started if file is damaged"""
+        saved = load_game(self.SAVE_PATH)
+        try:
+            os.remove(self.SAVE_PATH)
+        except OSError:
+            pass
+        if saved is None:
+            return
+        for difficulty, (size, mines) in DIFFICULTIES.items():
+            if (size, mines) == (saved.size, saved.mines):
+                if difficulty != self.__difficulty:
+                    self.__set_difficulty(difficulty)
+                    self.__store.set('DIFFICULTY', difficulty)
+                    self.__init_screen()
+                self.__board.resume(saved)
+                return
 
     def __read_data(self, data):
         """Replaces default settings with ones read from data file"""
         if 'LEADERS' in data:
-            self.__leaderboardContent = data["LEADERS"]
+            if self.__history.is_empty():
+                self.__history.import_leaders(data['LEADERS'], DIFFICULTIES)
+            self.__store.remove('LEADERS')
         if 'OPTIONS' in data:
             self.__optionsOpen = data['OPTIONS']
         if 'SOUND' in data:
             self.__soundOn = data['SOUND']
+        if 'NO_GUESS' in data:
+            self.__noGuess = data['NO_GUESS']
         if 'DIFFICULTY' in data:
             self.__set_difficulty(data['DIFFICULTY'])
 
+    def __get_board_area_size(self):
+        return (min(self.__cols * self.TILE_EDGE_LEN, self.MAX_BOARD_AREA_WIDTH),
+                min(self.__rows * self.TILE_EDGE_LEN, self.MAX_BOARD_AREA_HEIGHT))
+
+    def __get_window_size(self):
+        boardAreaWidth, boardAreaHeight = self.__get_board_area_size()
+        return (2 * self.MARGIN_SIZE + boardAreaWidth,
+                2 * self.MARGIN_SIZE + self.TOOLBAR_HEIGHT + self.TOP_BAR_HEIGHT + boardAreaHeight)
+
     def __init_screen(self):
         """Initializes screen and its components"""
-        boardAreaWidth = self.__cols * self.TILE_EDGE_LEN
-        boardAreaHeight = self.__rows * self.TILE_EDGE_LEN
-        windowWidth = 2 * self.MARGIN_SIZE + boardAreaWidth
-        windowHeight = 2 * self.MARGIN_SIZE + self.TOOLBAR_HEIGHT + self.TOP_BAR_HEIGHT + boardAreaHeight
+        boardAreaWidth, boardAreaHeight = self.__get_board_area_size()
+        windowWidth, windowHeight = self.__get_window_size()
 
         self.__screen = pygame.display.set_mode((windowWidth, windowHeight))
 
-        self.__backgroundPicture = pygame.image.load('assets/background.jpg')
-        self.__backgroundPicture = pygame.transform.smoothscale(self.__backgroundPicture, (windowWidth, windowHeight))
+        self.__backgroundPicture = self.__assetCache.load('assets/background.jpg', (windowWidth, windowHeight),
+                                                          alpha=False)
 
         self.__boardAreaRect = pygame.Rect(self.MARGIN_SIZE,
                                            self.MARGIN_SIZE + self.TOOLBAR_HEIGHT + self.TOP_BAR_HEIGHT,
                                            boardAreaWidth, boardAreaHeight)
 
-        self.__board.get_rect().size = (self.__cols * self.TILE_EDGE_LEN, self.__rows * self.TILE_EDGE_LEN)
+        self.__board.set_view_size(self.__boardAreaRect.size)
         self.__board.get_rect().center = self.__boardAreaRect.center
 
         self.__face = ImageButton(self.__icons["face_happy"], self.__board.reset, self)
+        self.__faceIcon = self.__icons["face_happy"]
         self.__face.get_rect().centerx = self.__screen.get_rect().centerx
         self.__face.get_rect().centery = self.MARGIN_SIZE + self.TOOLBAR_HEIGHT + self.TOP_BAR_HEIGHT / 2
 
+        self.__scrubber = Scrubber(boardAreaWidth, self.SCRUBBER_HEIGHT, self.FONT_COLOR, self.BACKGROUND_COLOR,
+                                   self.__seek_replay)
+        self.__scrubber.get_rect().left = self.__boardAreaRect.left
+        self.__scrubber.get_rect().centery = self.__boardAreaRect.bottom + self.MARGIN_SIZE / 2
+        self.__scrubberShown = False
+
         self.__init_counters(windowWidth)
         self.__init_toolbar(windowWidth)
         self.__init_leaderboard(windowWidth)
         self.__init_entry()
         self.__init_delete_data_screen()
+        self.__fullRedraw = True
 
     def __init_delete_data_screen(self):
         """Initializes elements of deletion screen"""
@@ -154,7 +242,8 @@ class Game:
                                       "Enter name (max. 10 characters)",
                                       self.NAME_INPUT_LEN_LIMIT, self.__handle_name_entry)
         self.__bravoInfo = Element(
-            self.__biggerFont.render("Congratulations, your score is among best!", True, self.ON_BACKGROUND_TEXT_COLOR))
+            TEXT_CACHE.render(self.__biggerFont, "Congratulations, your score is among best!",
+                              self.ON_BACKGROUND_TEXT_COLOR))
 
         self.__bravoInfo.get_rect().top = (self.MARGIN_SIZE + 1.4 * self.BIGGER_FONT_SIZE)
         self.__bravoInfo.get_rect().centerx = self.__screen.get_rect().centerx
@@ -164,14 +253,15 @@ class Game:
 
     def __init_counters(self, windowWidth):
         """Initializes counter elements"""
-        self.__flagCounter = Counter(pygame.Surface((3 * self.TIMER_DIG_WIDTH, self.TIMER_DIG_HEIGHT)), [0, 0, 0], self)
+        digitsNo = max(self.COUNTER_DIGITS_NO, len(str(self.__bombs)))
+        self.__flagCounter = Counter(digitsNo, self)
         self.__flagCounter.get_rect().left = self.MARGIN_SIZE + 5
         self.__flagCounter.get_rect().top = \
             self.MARGIN_SIZE + self.TOOLBAR_HEIGHT + self.TOP_BAR_HEIGHT / 2 - self.TIMER_DIG_HEIGHT / 2 - 5
         self.__flagCounter.set_value(self.__board.get_flagsLeft())
 
-        self.__timer = Counter(pygame.Surface((3 * self.TIMER_DIG_WIDTH, self.TIMER_DIG_HEIGHT)), [0, 0, 0], self)
-        self.__timer.get_rect().left = windowWidth - self.MARGIN_SIZE - 3 * self.TIMER_DIG_WIDTH - 5
+        self.__timer = Counter(digitsNo, self)
+        self.__timer.get_rect().left = windowWidth - self.MARGIN_SIZE - digitsNo * self.TIMER_DIG_WIDTH - 5
         self.__timer.get_rect().top = \
             self.MARGIN_SIZE + self.TOOLBAR_HEIGHT + self.TOP_BAR_HEIGHT / 2 - self.TIMER_DIG_HEIGHT / 2 - 5
 
@@ -180,7 +270,7 @@ class Game:
         self.__leaderboard = Leaderboard(self.__biggerFont, self.__smallerFont,
                                          self.FONT_COLOR, self.BACKGROUND_COLOR, self.__icons['logo'],
                                          self.LEADERBOARD_ENTRY_LIMIT, windowWidth * 0.95,
-                                         self.__leaderboardContent)
+                                         self.__history)
         self.__leaderboard.get_rect().top = self.MARGIN_SIZE
         self.__leaderboard.get_rect().centerx = self.__screen.get_rect().centerx
 
@@ -225,19 +315,13 @@ class Game:
 
     def __warn_before_deleting_data(self):
         """Changes screen mode to deletion if necessary"""
-        entryCount = 0
-        for key in self.__leaderboard.get_data().keys():
-            entryCount += len(self.__leaderboard.get_data()[key])
-        if entryCount > 0:
+        if self.__history.count_leaders() > 0:
             self.__mode = WindowMode.delete
 
     def __delete_leaderboard_data(self):
         """Deletes all entries from leaderboard"""
-        if self.__soundOn:
-            self.__sounds['sound_cutting'].play()
-
-        self.__leaderboardContent = {'BEGINNER': [], 'INTERMEDIATE': [], 'ADVANCED': []}
-        self.__leaderboard.set_data({'BEGINNER': [], 'INTERMEDIATE': [], 'ADVANCED': []})
+        self.play_sound('sound_cutting')
+        self.__history.clear_leaders()
         self.__leaderboard.fill_lanes()
         self.__show_leaderboard()
 
@@ -248,10 +332,15 @@ class Game:
     def __toggle_difficulty_settings(self):
         """Toggles difficulty menu"""
         self.__optionsOpen = not self.__optionsOpen
+        self.__store.set('OPTIONS', self.__optionsOpen)
+        self.__fullRedraw = True
 
     def __toggle_sound(self):
         """Toggles sound"""
         self.__soundOn = not self.__soundOn
+        self.__store.set('SOUND', self.__soundOn)
+        if self.__soundOn:
+            self.__sounds.start()
         self.__update_sound_button()
 
     def __update_sound_button(self):
@@ -260,44 +349,113 @@ class Game:
             self.__soundButton.update_surface(self.__icons['sound_on'])
         else:
             self.__soundButton.update_surface(self.__icons['sound_off'])
+        self.__fullRedraw = True
 
     def __handle_name_entry(self, name):
         """Handles events after name entry"""
         if not name:
             return
-        self.__leaderboard.update(self.__difficultyBox.get_selected(), name, self.__timer.get_value())
+        self.__leaderboard.update(self.__lastGameId, name)
         self.__show_leaderboard()
 
     def __draw_all(self):
-        """Draws all visual elements on screen"""
+        """Draws all visual elements on screen, in game mode only ones that changed since last frame"""
+        if self.__mode != self.__drawnMode:
+            self.__drawnMode = self.__mode
+            self.__fullRedraw = True
+
+        if self.__mode == WindowMode.game and not self.__fullRedraw:
+            refresh = self.__statsShown and self.__update_stats()
+            with self.__profiler.measure('board'):
+                rects = self.__board.draw(self.__screen, refresh)
+            with self.__profiler.measure('top_bar'):
+                rects += self.__draw_top_bar()
+            rects += self.__draw_scrubber()
+            self.__draw_stats(rects)
+            self.__profiler.count('tiles', self.__board.get_drawnTilesNo())
+            self.__profiler.count('rects', len(rects))
+            with self.__profiler.measure('display'):
+                pygame.display.update(rects)
+            return
+
         self.__screen.blit(self.__backgroundPicture, self.__screen.get_rect())
 
         if self.__mode == WindowMode.leaderboard:
             self.__leaderboard.draw(self.__screen)
             self.__returnButton.draw(self.__screen)
             self.__clearButton.draw(self.__screen)
-            pygame.display.flip()
-            return
 
         elif self.__mode == WindowMode.entry:
             self.__timeInfo.draw(self.__screen)
             self.__bravoInfo.draw(self.__screen)
             self.__nameInput.draw(self.__screen)
-            pygame.display.flip()
-            return
 
         elif self.__mode == WindowMode.delete:
             self.__warningPopup.draw(self.__screen)
             self.__confirmButton.draw(self.__screen)
             self.__abortButton.draw(self.__screen)
-            pygame.display.flip()
-            return
 
-        self.__board.draw(self.__screen)
-        self.__draw_top_bar()
-        self.__draw_toolbar()
+        else:
+            if self.__statsShown:
+                self.__update_stats()
+            with self.__profiler.measure('board'):
+                self.__board.draw(self.__screen, True)
+            self.__profiler.count('tiles', self.__board.get_drawnTilesNo())
+            with self.__profiler.measure('top_bar'):
+                self.__draw_top_bar(True)
+            with self.__profiler.measure('toolbar'):
+                self.__draw_toolbar()
+            self.__scrubberShown = False
+            self.__draw_scrubber()
+            self.__draw_stats(full=True)
+            self.__fullRedraw = False
+
+        with self.__profiler.measure('display'):
+            pygame.display.flip()
 
-        pygame.display.flip()
+    def __update_stats(self):
+        """Renders frame statistics again if they are older than refresh time, returns whether they were rendered,
+            lines change all the time so they are not kept in text cache"""
+        now = pygame.time.get_ticks()
+        if self.__statsPicture is not None and now - self.__statsTime < self.STATS_REFRESH_TIME:
+            return False
+        self.__statsTime = now
+
+        lines = []
+        for phase in self.__profiler.get_phases():
+            percentiles = self.__profiler.get_percentiles(phase)
+            if percentiles is not None:
+                lines.append("{} ms: p50 {:.1f}  p95 {:.1f}  p99 {:.1f}".format(phase, *percentiles))
+        lines.append("dropped frames: {} of {} over {:.1f} ms".format(
+            self.__profiler.get_droppedNo(), self.__profiler.get_framesNo(), self.__profiler.get_budget()))
+        lines.append("tiles blitted: {} last, {:.1f} mean".format(
+            self.__profiler.get_last_count('tiles'), self.__profiler.get_mean_count('tiles')))
+        lines.append("text cache hit rate: {:.0%}".format(TEXT_CACHE.get_hitRate()))
+        lines.append("layout pool: {} hits, {} misses".format(self.__layoutPool.get_hits(),
+                                                                self.__layoutPool.get_misses()))
+
+        rendered = [self.__biggerFont.render(line, True, self.ON_BACKGROUND_TEXT_COLOR) for line in lines]
+        margin = self.BIGGER_FONT_SIZE / 2
+        self.__statsPicture = pygame.Surface((max(line.get_width() for line in rendered) + 2 * margin,
+                                              sum(line.get_height() for line in rendered) + 2 * margin),
+                                             pygame.SRCALPHA)
+        self.__statsPicture.fill(self.STATS_BACKGROUND_COLOR)
+        y = margin
+        for line in rendered:
+            self.__statsPicture.blit(line, (margin, y))
+            y += line.get_height()
+        return True
+
+    def __draw_stats(self, rects=(), full=False):
+        """Draws frame statistics over board if they are shown, only parts over given rectangles which were just drawn
+            unless full is set, so that translucent background is not blended twice"""
+        if not self.__statsShown:
+            return
+        rect = self.__statsPicture.get_rect(topleft=self.__board.get_rect().move(5, 5).topleft)
+        for drawn in [rect] if full else rects:
+            clip = rect.clip(drawn)
+            if clip:
+                self.__screen.blit(self.__statsPicture, clip, clip.move(-rect.left, -rect.top))
 
     def __draw_toolbar(self):
         """Draws toolbar"""
@@ -307,31 +465,55 @@ class Game:
             self.__difficultyBox.draw(self.__screen)
         self.__soundButton.draw(self.__screen)
 
-    def __draw_top_bar(self):
-        """Draws all elements of top bar"""
+    def __draw_top_bar(self, full=False):
+        """Draws elements of top bar which changed since last call or all of them if full is set,
+            returns list of their rectangles"""
         self.__update_face()
-        self.__face.draw(self.__screen)
-
         self.__flagCounter.set_value(self.__board.get_flagsLeft())
-        self.__flagCounter.update_display()
-        self.__flagCounter.draw(self.__screen)
-
         if self.__board.get_status() == GameState.running:
-            time = (pygame.time.get_ticks() - self.__board.get_startTime()) / 1000
-            if time > 999:
-                time = 999
-            self.__timer.set_value(time)
-        self.__timer.update_display()
-        self.__timer.draw(self.__screen)
+            self.__timer.set_value((pygame.time.get_ticks() - self.__board.get_startTime()) / 1000)
+
+        elements = (self.__face, self.__flagCounter, self.__timer)
+        state = (self.__faceIcon, self.__flagCounter.get_value(), self.__timer.get_value())
+        drawn = self.__drawnTopBar
+        self.__drawnTopBar = state
+        return [self.__draw_over_background(element) for i, element in enumerate(elements)
+                if full or state[i] != drawn[i]]
+
+    def __draw_scrubber(self):
+        """Draws progress of watched replay if it changed since last call, covers scrubber once replay is left,
+            returns list of updated rectangles"""
+        if not self.__board.is_watching():
+            if not self.__scrubberShown:
+                return []
+            self.__scrubberShown = False
+            self.__screen.blit(self.__backgroundPicture, self.__scrubber.get_rect(), self.__scrubber.get_rect())
+            return [self.__scrubber.get_rect()]
+
+        duration = self.__board.get_watchedDuration()
+        changed = self.__scrubber.set_progress(self.__board.get_watchedTime() / duration if duration else 1)
+        if not changed and self.__scrubberShown:
+            return []
+        self.__scrubberShown = True
+        return [self.__draw_over_background(self.__scrubber)]
+
+    def __draw_over_background(self, element):
+        """Draws element onto screen covering what was previously drawn in its place, returns its rectangle"""
+        self.__screen.blit(self.__backgroundPicture, element.get_rect(), element.get_rect())
+        element.draw(self.__screen)
+        return element.get_rect()
 
     def __update_face(self):
         """Updates icon placed od reset button"""
         if self.__board.get_status() == GameState.waiting or self.__board.get_status() == GameState.running:
-            self.__face.update_surface(self.__icons['face_happy'])
+            icon = self.__icons['face_happy']
         elif self.__board.get_status() == GameState.lost:
-            self.__face.update_surface(self.__icons['face_death'])
-        elif self.__board.get_status() == GameState.won:
-            self.__face.update_surface(self.__icons['face_cool'])
+            icon = self.__icons['face_death']
+        else:
+            icon = self.__icons['face_cool']
+        if icon is not self.__faceIcon:
+            self.__faceIcon = icon
+            self.__face.update_surface(icon)
 
     def __load_icons(self):
         """Creates and returns dictionary with .png files at said directory"""
@@ -339,36 +521,43 @@ class Game:
         for fileName in os.listdir("assets"):
             if not fileName.endswith(".png"):
                 continue
-            icon = pygame.image.load("assets/" + fileName)
+            name = fileName.split('.')[0]
+            size, smooth = self.__tileSize, False
             if fileName.startswith("timer_"):
-                icon = pygame.transform.smoothscale(icon, self.__counterSize)
+                size, smooth = self.__counterSize, True
             elif fileName.startswith("face_"):
-                icon = pygame.transform.smoothscale(icon, self.__faceSize)
+                size, smooth = self.__faceSize, True
             elif fileName.startswith('logo'):
-                icon = pygame.transform.smoothscale(icon, self.LOGO_SIZE)
+                size, smooth = self.LOGO_SIZE, True
             elif fileName.startswith("sound_"):
-                icon = pygame.transform.smoothscale(icon, self.__soundButtonSize)
+                size, smooth = self.__soundButtonSize, True
             elif fileName.startswith("warning"):
-                icon = pygame.transform.smoothscale(icon, self.WARNING_ICON_SIZE)
+                size, smooth = self.WARNING_ICON_SIZE, True
             else:
-                icon = pygame.transform.scale(icon, self.__tileSize)
-            icons[fileName.split('.')[0]] = icon
+                self.__tileNames.append(name)
+            icons[name] = self.__assetCache.load("assets/" + fileName, tuple(size), smooth)
+        icons['timer_-'] = create_minus_digit(icons['timer_8'], icons['timer_0']).convert_alpha()
+        self.__assetCache.release_sources()
         return icons
 
-    def __process_events(self):
+    def __process_events(self, events):
         """Handles all happening events"""
+        for event in events:
+            if event.type in [pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED]:
+                self.__fullRedraw = True
+
         if self.__mode == WindowMode.leaderboard:
-            self.__process_events_leaderboard()
+            self.__process_events_leaderboard(events)
         elif self.__mode == WindowMode.entry:
-            self.__process_events_entry()
+            self.__process_events_entry(events)
         elif self.__mode == WindowMode.delete:
-            self.__process_events_delete_data()
+            self.__process_events_delete_data(events)
         else:
-            self.__process_events_game()
+            self.__process_events_game(events)
 
-    def __process_events_delete_data(self):
+    def __process_events_delete_data(self, events):
         """Handles events on data deletion screen"""
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.__running = False
                 break
@@ -382,9 +571,9 @@ class Game:
             elif event.type == pygame.MOUSEBUTTONUP:
                 self.__warningPopup.handle_mouse_up(event.button)
 
-    def __process_events_entry(self):
+    def __process_events_entry(self, events):
         """Handles events on new entry creation screen"""
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.__running = False
                 break
@@ -392,9 +581,9 @@ class Game:
             elif event.type == pygame.KEYDOWN:
                 self.__nameInput.handle_key_down(event)
 
-    def __process_events_leaderboard(self):
+    def __process_events_leaderboard(self, events):
         """Handles events on leaderboard screen"""
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.__running = False
                 break
@@ -407,9 +596,9 @@ class Game:
                 self.__returnButton.handle_mouse_up(event.button)
                 self.__clearButton.handle_mouse_up(event.button)
 
-    def __process_events_game(self):
+    def __process_events_game(self, events):
         """Handles events on main game screen"""
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.__running = False
                 break
@@ -422,34 +611,69 @@ class Game:
                 if self.__optionsOpen:
                     self.__difficultyBox.handle_mouse_up(event.button)
                 self.__soundButton.handle_mouse_up(event.button)
+                self.__scrubber.handle_mouse_up(event.button)
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 self.__board.handle_mouse_down(event.button)
+                if self.__board.is_watching():
+                    self.__scrubber.handle_mouse_down(event.button)
+
+            if event.type == pygame.MOUSEMOTION:
+                self.__scrubber.handle_mouse_motion()
+
+            if event.type == pygame.MOUSEWHEEL:
+                self.__board.zoom(event.y, pygame.mouse.get_pos())
+
+            if event.type == pygame.KEYDOWN:
+                step = self.__board.get_rect().width // 4, self.__board.get_rect().height // 4
+                if event.key == pygame.K_LEFT:
+                    self.__board.scroll(-step[0], 0)
+                elif event.key == pygame.K_RIGHT:
+                    self.__board.scroll(step[0], 0)
+                elif event.key == pygame.K_UP:
+                    self.__board.scroll(0, -step[1])
+                elif event.key == pygame.K_DOWN:
+                    self.__board.scroll(0, step[1])
+                elif event.key == pygame.K_h:
+                    self.__board.show_hint()
+                elif event.key == pygame.K_a:
+                    self.__board.auto_solve()
+                elif event.key == pygame.K_p:
+                    self.__board.toggle_overlay()
+                elif event.key == pygame.K_f:
+                    self.__statsShown = not self.__statsShown
+                    self.__statsPicture = None
+                    self.__fullRedraw = True
+                elif event.key == pygame.K_n:
+                    self.__noGuess = not self.__noGuess
+                    self.__store.set('NO_GUESS', self.__noGuess)
+                    self.__board.set_noGuess(self.__noGuess)
+
+        if self.__board.is_watching():
+            self.__scrubber.flush()
 
     def __set_difficulty(self, difficulty):
         """Sets internal parameters according to passed difficulty string"""
+        if difficulty not in DIFFICULTIES:
+            return
         self.__difficulty = difficulty
-        if difficulty == "BEGINNER":
-            self.__rows = 9
-            self.__cols = 9
-            self.__bombs = 10
-        elif difficulty == 'INTERMEDIATE':
-            self.__rows = 16
-            self.__cols = 16
-            self.__bombs = 40
-        elif difficulty == 'ADVANCED':
-            self.__rows = 16
-            self.__cols = 30
-            self.__bombs = 99
+        (self.__rows, self.__cols), self.__bombs = DIFFICULTIES[difficulty]
+
+    def __record_game(self, won):
+        """Stores finished game in history"""
+        replay = self.__board.get_replay()
+        self.__lastGameId = self.__history.record_game(self.__difficultyBox.get_selected(), replay.get_size(),
+                                                       replay.get_mines(), won, self.__board.get_time(),
+                                                       replay.get_seed(), replay=replay.encode())
 
     def handle_victory(self):
         """Prepares visual elements and changes screen after victory is achieved"""
-        if self.__soundOn:
-            self.__sounds['sound_win'].play()
-        if self.__leaderboard.needs_update(self.__difficultyBox.get_selected(), self.__timer.get_value()):
+        self.play_sound('sound_win')
+        self.__record_game(True)
+        if self.__leaderboard.needs_update(self.__difficultyBox.get_selected(), self.__board.get_time()):
             self.__timeInfo = Element(
-                self.__biggerFont.render("You've achieved victory in {} seconds".format(self.__timer.get_value()), True,
-                                         self.ON_BACKGROUND_TEXT_COLOR))
+                TEXT_CACHE.render(self.__biggerFont, "You've achieved victory in {} seconds".format(
+                    self.__board.get_time()), self.ON_BACKGROUND_TEXT_COLOR))
             self.__timeInfo.get_rect().top = self.MARGIN_SIZE
             self.__timeInfo.get_rect().centerx = self.__screen.get_rect().centerx
             self.__nameInput.reset_input()
@@ -457,25 +681,78 @@ class Game:
             sleep(self.NAME_INPUT_DELAY)
             self.__mode = WindowMode.entry
 
+    def handle_defeat(self):
+        """Stores lost game in history"""
+        self.__record_game(False)
+
     def change_difficulty(self, difficulty):
         self.__set_difficulty(difficulty)
+        self.__store.set('DIFFICULTY', difficulty)
         self.__init_screen()
         self.__reset_game()
 
+    def __seek_replay(self, fraction):
+        """Moves watched replay to given fraction of its duration"""
+        self.__board.seek(fraction * self.__board.get_watchedDuration())
+
+    def watch_replay(self, gameId):
+        """Starts playing replay of game stored in history, returns whether game has replay"""
+        found = self.__history.get_replay(gameId)
+        if found is None or found[1] is None:
+            return False
+        self.__set_difficulty(found[0])
+        self.__init_screen()
+        self.__board.watch(Replay.decode(found[1]))
+        return True
+
+    def __get_wait_time(self):
+        """Returns number of milliseconds main loop may sleep waiting for events, 0 if it may sleep until one comes"""
+        if self.__board.is_generating() or self.__board.is_playing():
+            return self.BACKGROUND_POLL_TIME
+        if self.__mode == WindowMode.game and self.__board.get_status() == GameState.running:
+            return 1000 - (pygame.time.get_ticks() - self.__board.get_startTime()) % 1000
+        return 0
+
     def start_game_loop(self):
-        """Starts main game loop"""
+        """Starts main game loop, it sleeps until event comes, timer shown has to change
+            or background work has to be checked and redraws screen only after that"""
         clock = pygame.time.Clock()
         self.__running = True
+        self.__draw_all()
         while self.__running:
             clock.tick(self.FRAME_RATE)
-            self.__process_events()
-            self.__draw_all()
+            events = [pygame.event.wait(self.__get_wait_time())] + pygame.event.get()
+            self.__profiler.begin_frame()
+            with self.__profiler.measure('events'):
+                self.__process_events(events)
+            changed = self.__board.update()
+            if changed or self.__scrubber.is_dragging() or any(event.type != pygame.MOUSEMOTION for event in events):
+                self.__draw_all()
+            self.__profiler.end_frame()
+        self.__board.shutdown()
+        self.__layoutPool.shutdown()
+        if self.__profilePath is not None:
+            self.__profiler.export(self.__profilePath)
 
     def get_icons(self):
         return self.__icons
 
-    def get_sounds(self):
-        return self.__sounds
+    def get_tile_icons(self, edge):
+        """Returns dictionary with tile images scaled to given edge length, keeping them for later calls"""
+        if edge not in self.__tileIcons:
+            largest = self.ZOOM_LEVELS[-1], self.ZOOM_LEVELS[-1]
+            self.__tileIcons[edge] = {name: self.__assetCache.load("assets/{}.png".format(name), (edge, edge),
+                                                                   base=largest)
+                                      for name in self.__tileNames}
+        return self.__tileIcons[edge]
+
+    def get_layoutPool(self):
+        return self.__layoutPool
+
+    def play_sound(self, name):
+        """Plays sound of given name if sound is on"""
+        if self.__soundOn:
+            self.__sounds.play(name)
 
     def get_timer(self):
         return self.__timer
@@ -483,49 +760,96 @@ class Game:
     def is_sound_on(self):
         return self.__soundOn
 
-    def get_tile_icon(self, tile):
-        """Returns image according to state of tile passed as argument and game state"""
+    def get_sprite_table(self, status):
+        return self.__spriteTables[status]
+
+    def __create_sprite_tables(self):
+        """Creates and returns dictionary with array for each game state,
+            mapping codes of tile state to indices of sprites in SPRITE_NAMES"""
+        tables = {}
+        for status in GameState:
+            table = np.zeros(CODES_NUMBER, dtype=np.intp)
+            for code in range(CODES_NUMBER):
+                table[code] = SPRITE_NAMES.index(self.__get_sprite_name(status, code))
+            tables[status] = table
+        return tables
+
+    @staticmethod
+    def __get_sprite_name(status, code):
+        """Returns name of image according to tile state code and game state"""
+        minesAround = str(code % 9)
+        isMine = code // 9 % 2 == 1
+        isClicked = code // 18 % 2 == 1
+        isFlagged = code // 36 % 2 == 1
         name = ''
-        if self.__board.get_status() == GameState.running or self.__board.get_status() == GameState.waiting:
-            if tile.is_clicked():
-                name = "mine_boom" if tile.is_mine() else str(tile.get_minesAroundNo())
+        if status == GameState.running or status == GameState.waiting:
+            if isClicked:
+                name = "mine_boom" if isMine else minesAround
             else:
-                name = "flagged_tile" if tile.is_flagged() else "blanc_tile"
-        elif self.__board.get_status() == GameState.lost:
-            if tile.is_clicked():
-                name = "mine_boom" if tile.is_mine() else str(tile.get_minesAroundNo())
-            elif tile.is_flagged():
-                name = "not_mine" if tile.is_flagged() and not tile.is_mine() else "flagged_tile"
+                name = "flagged_tile" if isFlagged else "blanc_tile"
+        elif status == GameState.lost:
+            if isClicked:
+                name = "mine_boom" if isMine else minesAround
+            elif isFlagged:
+                name = "not_mine" if isFlagged and not isMine else "flagged_tile"
             else:
-                name = "mine" if tile.is_mine() else "blanc_tile"
-        elif self.__board.get_status() == GameState.won:
-            if tile.is_mine():
+                name = "mine" if isMine else "blanc_tile"
+        elif status == GameState.won:
+            if isMine:
                 name = "flagged_tile"
             else:
-                name = str(tile.get_minesAroundNo())
-        return self.__icons[name]
-
-    def save_data(self, dataFilePath):
-        """Saves chosen data to data file"""
-        state = {
-            "DIFFICULTY": self.__difficultyBox.get_selected(),
-            "OPTIONS": self.__optionsOpen,
-            "SOUND": self.__soundOn,
-            "LEADERS": self.__leaderboard.get_data()
-        }
-        with open(dataFilePath, "w") as file:
-            json.dump(state, file)
+                name = minesAround
+        return name
+
+    def save_data(self):
+        """Writes all changes of game data recorded in journal to data file, closes game history
+            and saves game in progress"""
+        if self.__board.get_status() == GameState.running and not self.__board.is_watching():
+            save_game(self.SAVE_PATH, self.__board.get_engine(),
+                      pygame.time.get_ticks() - self.__board.get_startTime(), self.__board.get_replay())
+        self.__store.close()
+        self.__history.close()
+
+
+def verify_leaderboard():
+    """Plays replays of all leaderboard entries without drawing and reports ones which do not prove their times"""
+    history = GameHistory(Game.HISTORY_PATH)
+    checked, missing, rejected = 0, 0, 0
+    for gameId, player, difficulty, rows, cols, mines, time, data in history.get_ranked_replays():
+        checked += 1
+        if data is None:
+            missing += 1
+        elif (DIFFICULTIES.get(difficulty) != ((rows, cols), mines)
+              or not verify_replay(data, time, (rows, cols), mines)):
+            rejected += 1
+            print(f"Game {gameId} of {player} won on {difficulty} in {time} seconds is not proved by its replay")
+    history.close()
+    print(f"{checked} entries checked, {missing} without replay, {rejected} rejected")
 
 
 def run():
+    parser = argparse.ArgumentParser(description="Minesweeper")
+    parser.add_argument('--replay', type=int, metavar='GAME_ID', help="watch replay of game stored in history")
+    parser.add_argument('--verify', action='store_true', help="check replays of leaderboard entries and exit")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="write times of frames to CSV file at exit, JSON with summary if PATH ends with .json")
+    args = parser.parse_args()
+    if args.verify:
+        verify_leaderboard()
+        return
+
     try:
-        pygame.init()
+        pygame.display.init()
+        pygame.font.init()
+        pygame.time.Clock()  # first clock starts timer read by get_ticks, mixer is left to sound library
         pygame.display.set_caption("Minesweeper")
         pygame.display.set_icon(pygame.image.load('assets/logo.png'))
         pygame.mouse.set_visible(True)
-        game = Game()
+        game = Game(args.profile)
+        if args.replay is not None and not game.watch_replay(args.replay):
+            print(f"There is no replay of game {args.replay}")
         game.start_game_loop()
-        game.save_data(game.DATAFILE_PATH)
+        game.save_data()
     except pygame.error as err:
         print(f"An error occurred: {err.args}")
     finally:
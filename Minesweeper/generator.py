@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from engine import Engine
+from solver import Solver
+from state import GameState
+
+
+def is_solvable(size, mines, index, seed):
+    """Returns whether mines layout generated with given seed for first move on given cell
+        can be cleared by solver without any guess"""
+    engine = Engine(size, mines, safeArea=True)
+    engine.reset(seed=seed)
+    solver = Solver(engine.get_field())
+    solver.update(engine.open(*index).changed)
+    while engine.get_status() == GameState.running:
+        move = solver.next_move()
+        if move is None:
+            return False
+        kind, row, col = move
+        if kind == 'open':
+            solver.update(engine.open(row, col).changed)
+        else:
+            engine.flag(row, col)
+    return engine.get_status() == GameState.won
+
+
+def find_solvable_seed(size, mines, index, seed, deadline):
+    """Tries random seeds drawn from generator seeded with given seed until deadline,
+        returns first one which layout is solvable without guessing or None if time ran out"""
+    rng = np.random.default_rng(seed)
+    while time.time() < deadline:
+        candidate = int(rng.integers(2 ** 32))
+        if is_solvable(size, mines, index, candidate):
+            return candidate
+    return None
+
+
+class NoGuessGenerator:
+    """Class which object searches for mines layouts solvable without guessing on pool of worker processes,
+        batches of seeds are tried concurrently and search gives up after time limit"""
+
+    TIME_LIMIT = 2.0
+    BATCH_TIME = 0.1
+
+    def __init__(self, workers=None, timeLimit=TIME_LIMIT):
+        self.__workers = workers or os.cpu_count()
+        self.__timeLimit = timeLimit
+        self.__pool = None
+        self.__rng = np.random.default_rng()
+        self.__request = None
+        self.__deadline = None
+        self.__futures = []
+        self.__result = None
+
+    def __submit(self):
+        """Gives worker process next batch of attempts lasting at most BATCH_TIME,
+            short batches keep workers from wasting time on search that already succeeded"""
+        deadline = min(time.time() + self.BATCH_TIME, self.__deadline)
+        self.__futures.append(self.__pool.submit(find_solvable_seed, *self.__request,
+                                                 int(self.__rng.integers(2 ** 32)), deadline))
+
+    def start(self, size, mines, index):
+        """Starts search for layout of given size and amount of mines solvable from first move on given cell"""
+        self.cancel()
+        if self.__pool is None:
+            # forking would copy threads of game, such as layout pool and SDL ones, into workers
+            self.__pool = ProcessPoolExecutor(self.__workers, mp_context=multiprocessing.get_context('spawn'))
+        self.__request = size, mines, index
+        self.__deadline = time.time() + self.__timeLimit
+        self.__result = None
+        for _ in range(self.__workers):
+            self.__submit()
+
+    def poll(self):
+        """Returns None while search is in progress, otherwise pair of seed and flag telling
+            whether layout of seed is solvable, random seed is given after time limit ran out"""
+        if self.__result is not None or self.__request is None:
+            return self.__result
+
+        for future in [future for future in self.__futures if future.done()]:
+            self.__futures.remove(future)
+            if not future.cancelled() and future.result() is not None:
+                self.__result = future.result(), True
+                break
+            if time.time() <= self.__deadline:
+                self.__submit()
+        if self.__result is None and time.time() > self.__deadline:
+            self.__result = int(self.__rng.integers(2 ** 32)), False
+        if self.__result is not None:
+            self.cancel()
+        return self.__result
+
+    def cancel(self):
+        """Abandons search in progress"""
+        for future in self.__futures:
+            future.cancel()
+        self.__futures = []
+        self.__request = None
+
+    def shutdown(self):
+        """Stops worker processes"""
+        self.cancel()
+        if self.__pool is not None:
+            self.__pool.shutdown(wait=False, cancel_futures=True)
+            self.__pool = None
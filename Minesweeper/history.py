@@ -0,0 +1,112 @@
+import sqlite3
+import time as clock
+
+
+class GameHistory:
+    """Class which object stores every finished game in SQLite database,
+        leaderboard pages, personal bests, percentiles and players histories are answered by its indexes"""
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY,
+            player TEXT,
+            difficulty TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            cols INTEGER NOT NULL,
+            mines INTEGER NOT NULL,
+            won INTEGER NOT NULL,
+            time NUMERIC NOT NULL,
+            date REAL NOT NULL,
+            seed INTEGER,
+            ranked INTEGER NOT NULL DEFAULT 1,
+            replay BLOB
+        );
+        CREATE INDEX IF NOT EXISTS games_difficulty_time ON games (difficulty, time) WHERE won;
+        CREATE INDEX IF NOT EXISTS games_player_date ON games (player, date);
+    '''
+
+    def __init__(self, path):
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute('PRAGMA journal_mode = WAL')
+        self.__connection.executescript(self.SCHEMA)
+        columns = [row[1] for row in self.__connection.execute('PRAGMA table_info(games)')]
+        if 'replay' not in columns:
+            with self.__connection:
+                self.__connection.execute('ALTER TABLE games ADD COLUMN replay BLOB')
+
+    def record_game(self, difficulty, size, mines, won, time, seed=None, player=None, date=None, replay=None):
+        """Stores finished game with its encoded replay and returns its identifier"""
+        with self.__connection:
+            cursor = self.__connection.execute(
+                'INSERT INTO games (player, difficulty, rows, cols, mines, won, time, date, seed, replay) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (player, difficulty, size[0], size[1], mines, int(won), time,
+                 clock.time() if date is None else date, seed, replay))
+        return cursor.lastrowid
+
+    def set_player(self, gameId, player):
+        """Assigns name of player to stored game"""
+        with self.__connection:
+            self.__connection.execute('UPDATE games SET player = ? WHERE id = ?', (player, gameId))
+
+    def get_top(self, difficulty, limit, offset=0):
+        """Returns page of list of (player, time) pairs of fastest won named games of difficulty shown on leaderboard"""
+        return self.__connection.execute(
+            'SELECT player, time FROM games WHERE won AND difficulty = ? AND ranked AND player IS NOT NULL '
+            'ORDER BY time, id LIMIT ? OFFSET ?', (difficulty, limit, offset)).fetchall()
+
+    def get_personal_best(self, player, difficulty):
+        """Returns best time of player in difficulty or None if player has not won such game"""
+        return self.__connection.execute(
+            'SELECT MIN(time) FROM games WHERE player = ? AND difficulty = ? AND won',
+            (player, difficulty)).fetchone()[0]
+
+    def get_percentile(self, difficulty, time):
+        """Returns percent of won games of difficulty which took longer than given time"""
+        total, slower = self.__connection.execute(
+            'SELECT COUNT(*), COUNT(CASE WHEN time > ? THEN 1 END) FROM games WHERE won AND difficulty = ?',
+            (time, difficulty)).fetchone()
+        return 100 * slower / total if total else 100.0
+
+    def get_player_history(self, player, limit=100):
+        """Returns latest games of player as list of (difficulty, won, time, date) tuples, newest first"""
+        return self.__connection.execute(
+            'SELECT difficulty, won, time, date FROM games WHERE player = ? ORDER BY date DESC LIMIT ?',
+            (player, limit)).fetchall()
+
+    def get_replay(self, gameId):
+        """Returns pair of difficulty and encoded replay of stored game, None if there is no such game"""
+        return self.__connection.execute('SELECT difficulty, replay FROM games WHERE id = ?', (gameId,)).fetchone()
+
+    def get_ranked_replays(self):
+        """Returns iterator over (id, player, difficulty, rows, cols, mines, time, replay) tuples
+            of games shown on leaderboard"""
+        return self.__connection.execute(
+            'SELECT id, player, difficulty, rows, cols, mines, time, replay FROM games '
+            'WHERE won AND ranked AND player IS NOT NULL')
+
+    def count_leaders(self):
+        """Returns number of games shown on leaderboard"""
+        return self.__connection.execute(
+            'SELECT COUNT(*) FROM games WHERE won AND ranked AND player IS NOT NULL').fetchone()[0]
+
+    def is_empty(self):
+        return self.__connection.execute('SELECT NOT EXISTS (SELECT 1 FROM games)').fetchone()[0] == 1
+
+    def clear_leaders(self):
+        """Removes all stored games from leaderboard, they are still kept in history of their players"""
+        with self.__connection:
+            self.__connection.execute('UPDATE games SET ranked = 0 WHERE ranked')
+
+    def import_leaders(self, leaders, sizes):
+        """Stores entries of leaderboard dictionary kept by older versions as won games of unknown date,
+            sizes maps difficulty to pair of board size and amount of mines"""
+        with self.__connection:
+            self.__connection.executemany(
+                'INSERT INTO games (player, difficulty, rows, cols, mines, won, time, date) '
+                'VALUES (?, ?, ?, ?, ?, 1, ?, 0)',
+                [(name, difficulty, sizes[difficulty][0][0], sizes[difficulty][0][1], sizes[difficulty][1], time)
+                 for difficulty, entries in leaders.items() if difficulty in sizes for name, time in entries])
+
+    def close(self):
+        self.__connection.close()
@@ -0,0 +1,201 @@
+import argparse
+import importlib
+import math
+import os
+import statistics
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from engine import Engine, DIFFICULTIES, CLOSED, FLAGGED, count_adjacent
+from solver import Solver
+from state import GameState
+
+
+class RandomStrategy:
+    """Strategy opening random closed cells"""
+    def __init__(self, rng):
+        self._rng = rng
+
+    def _guess(self, observation):
+        """Returns move opening random closed cell"""
+        closed = np.argwhere(observation == CLOSED)
+        row, col = closed[self._rng.integers(len(closed))]
+        return 'open', int(row), int(col), True
+
+    def next_move(self, engine):
+        """Returns next move as tuple (kind, row, col, guessed) where kind is 'open', 'flag' or 'chord'"""
+        return self._guess(engine.get_field().get_observation())
+
+
+class SimpleStrategy(RandomStrategy):
+    """Strategy applying single cell rules to opened numbers and guessing at random when none applies"""
+    def next_move(self, engine):
+        observation = engine.get_field().get_observation()
+        closed = observation == CLOSED
+        closedAround = count_adjacent(closed)
+        flaggedAround = count_adjacent(observation == FLAGGED)
+        numbers = (observation >= 0) & (closedAround > 0)
+
+        satisfied = numbers & (observation == flaggedAround)
+        safe = np.argwhere(closed & (count_adjacent(satisfied) > 0))
+        if len(safe):
+            return 'open', int(safe[0][0]), int(safe[0][1]), False
+
+        full = numbers & (observation == flaggedAround + closedAround)
+        mines = np.argwhere(closed & (count_adjacent(full) > 0))
+        if len(mines):
+            return 'flag', int(mines[0][0]), int(mines[0][1]), False
+
+        return self._guess(observation)
+
+
+class SolverStrategy(RandomStrategy):
+    """Strategy following moves of incrementally updated solver and guessing at random when none is certain"""
+    def __init__(self, rng):
+        super().__init__(rng)
+        self.__solver = None
+        self.__opened = None
+
+    def next_move(self, engine):
+        observation = engine.get_field().get_observation()
+        opened = observation >= 0
+        if self.__solver is None:
+            self.__solver = Solver(engine.get_field())
+        else:
+            self.__solver.update(np.argwhere(opened & ~self.__opened))
+        self.__opened = opened
+
+        move = self.__solver.next_move()
+        if move is None:
+            return self._guess(observation)
+        return move + (False,)
+
+
+STRATEGIES = {
+    'random': RandomStrategy,
+    'simple': SimpleStrategy,
+    'solver': SolverStrategy,
+}
+
+
+def get_strategy(name):
+    """Returns strategy class registered under given name or given as 'module:Class'"""
+    if name in STRATEGIES:
+        return STRATEGIES[name]
+    moduleName, _, className = name.partition(':')
+    return getattr(importlib.import_module(moduleName), className)
+
+
+def get_game_seed(seed, gameNo):
+    """Returns seed of game of given number in run started with given seed"""
+    return int(np.random.SeedSequence([seed, gameNo]).generate_state(1)[0])
+
+
+def play_game(strategyName, size, mines, seed):
+    """Plays single game and returns tuple (won, guesses, moves, seconds)"""
+    start = time.perf_counter()
+    engine = Engine(size, mines)
+    engine.reset(seed=seed)
+    strategy = get_strategy(strategyName)(np.random.default_rng(seed))
+    actions = {'open': engine.open, 'flag': engine.flag, 'chord': engine.chord}
+    guesses = moves = 0
+    while engine.get_status() in [GameState.waiting, GameState.running]:
+        kind, row, col, guessed = strategy.next_move(engine)
+        if guessed and engine.get_status() == GameState.running:
+            guesses += 1
+        actions[kind](row, col)
+        moves += 1
+    return engine.get_status() == GameState.won, guesses, moves, time.perf_counter() - start
+
+
+def play_games(strategyName, size, mines, seed, first, count):
+    """Plays games of given numbers and returns list of their results"""
+    return [play_game(strategyName, size, mines, get_game_seed(seed, gameNo)) for gameNo in range(first, first + count)]
+
+
+def wilson_interval(successes, total, z=1.96):
+    """Returns Wilson score confidence interval for proportion of successes"""
+    if total == 0:
+        return 0.0, 0.0
+    p = successes / total
+    centre = (p + z * z / (2 * total)) / (1 + z * z / total)
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / (1 + z * z / total)
+    return centre - margin, centre + margin
+
+
+def mean_interval(values, z=1.96):
+    """Returns mean of values and half width of its normal approximation confidence interval"""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, 0.0
+    return mean, z * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def report(results, elapsed):
+    """Prints summary of results of played games"""
+    wins = sum(1 for result in results if result[0])
+    low, high = wilson_interval(wins, len(results))
+    guesses, guessesMargin = mean_interval([result[1] for result in results])
+    seconds, secondsMargin = mean_interval([result[3] for result in results])
+    print("games: {}".format(len(results)))
+    print("win rate: {:.4f} (95% CI {:.4f} - {:.4f})".format(wins / len(results), low, high))
+    print("guesses per game: {:.3f} +- {:.3f}".format(guesses, guessesMargin))
+    print("time per game: {:.3f} ms +- {:.3f} ms".format(1000 * seconds, 1000 * secondsMargin))
+    print("throughput: {:.1f} games/s".format(len(results) / elapsed))
+
+
+def parse_arguments(argv=None):
+    """Returns parsed arguments with board size and amount of mines resolved, exits with usage if they are invalid"""
+    parser = argparse.ArgumentParser(description="Plays many minesweeper games with chosen strategy")
+    parser.add_argument('--difficulty', choices=list(DIFFICULTIES), default='BEGINNER')
+    parser.add_argument('--size', help="custom board size as ROWSxCOLS, requires --mines")
+    parser.add_argument('--mines', type=int)
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--strategy', default='solver', help="registered name or module:Class")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk', type=int, default=250, help="games given to worker at once")
+    arguments = parser.parse_args(argv)
+
+    size, mines = DIFFICULTIES[arguments.difficulty]
+    if arguments.size is not None:
+        if arguments.mines is None:
+            parser.error("--size requires --mines")
+        try:
+            size = tuple(int(value) for value in arguments.size.lower().split('x'))
+        except ValueError:
+            size = ()
+        if len(size) != 2 or min(size) < 1:
+            parser.error("--size must be ROWSxCOLS of positive numbers")
+    if arguments.mines is not None:
+        mines = arguments.mines
+    if not 0 <= mines < size[0] * size[1]:
+        parser.error("--mines must be at least 0 and less than number of cells")
+    if arguments.games < 1:
+        parser.error("--games must be at least 1")
+    if arguments.workers < 1 or arguments.chunk < 1:
+        parser.error("--workers and --chunk must be at least 1")
+    arguments.size, arguments.mines = size, mines
+    return arguments
+
+
+def run(argv=None):
+    arguments = parse_arguments(argv)
+    size, mines = arguments.size, arguments.mines
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(arguments.workers) as pool:
+        futures = [pool.submit(play_games, arguments.strategy, size, mines, arguments.seed, first,
+                               min(arguments.chunk, arguments.games - first))
+                   for first in range(0, arguments.games, arguments.chunk)]
+        for future in as_completed(futures):
+            results += future.result()
+            wins = sum(1 for result in results if result[0])
+            print("{}/{} games, win rate {:.4f}".format(len(results), arguments.games, wins / len(results)),
+                  flush=True)
+    report(results, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,95 @@
+import copy
+import json
+import os
+from utilities import unload_game_data, write_atomically
+
+
+class GameDataStore:
+    """Class which object keeps game data in snapshot file and journal of changes made since snapshot was written,
+        every change is appended to journal and forced to disk at once so that crash loses nothing,
+        snapshot is replaced atomically and tells which journal entries it already contains"""
+
+    COMPACTION_THRESHOLD = 100
+    SEQUENCE_KEY = 'JOURNAL_SEQUENCE'
+
+    def __init__(self, snapshotPath, journalPath=None):
+        self.__snapshotPath = snapshotPath
+        self.__journalPath = journalPath if journalPath is not None else snapshotPath + '.journal'
+        self.__data = {}
+        self.__sequence = 0
+        self.__journalLength = 0
+        self.__journal = None
+
+    @staticmethod
+    def __apply(data, change):
+        """Applies change read from journal to data"""
+        if change['op'] == 'set':
+            data[change['key']] = change['value']
+        elif change['op'] == 'remove':
+            data.pop(change['key'], None)
+
+    def __read_journal(self):
+        """Returns list of changes stored in journal, stops at first damaged line left by interrupted write"""
+        changes = []
+        try:
+            with open(self.__journalPath) as file:
+                for line in file:
+                    try:
+                        changes.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+        except IOError:
+            pass
+        return changes
+
+    def __append(self, change):
+        """Writes change to journal, applies it to kept data and compacts journal once it grows long"""
+        self.__sequence += 1
+        change['seq'] = self.__sequence
+        if self.__journal is None:
+            self.__journal = open(self.__journalPath, 'a')
+        self.__journal.write(json.dumps(change) + '\n')
+        self.__journal.flush()
+        os.fsync(self.__journal.fileno())
+        self.__apply(self.__data, change)
+        self.__journalLength += 1
+        if self.__journalLength >= self.COMPACTION_THRESHOLD:
+            self.compact()
+
+    def load(self):
+        """Reads snapshot, replays journal entries it does not contain yet and returns resulting data,
+            recovered data is written to new snapshot so that journal starts empty"""
+        self.__data = unload_game_data(self.__snapshotPath)
+        self.__sequence = self.__data.pop(self.SEQUENCE_KEY, 0)
+        changes = self.__read_journal()
+        for change in changes:
+            if change.get('seq', 0) > self.__sequence:
+                self.__apply(self.__data, change)
+                self.__sequence = change['seq']
+        self.compact()
+        return copy.deepcopy(self.__data)
+
+    def set(self, key, value):
+        """Records new value of setting"""
+        self.__append({'op': 'set', 'key': key, 'value': value})
+
+    def remove(self, key):
+        """Records removal of setting"""
+        self.__append({'op': 'remove', 'key': key})
+
+    def compact(self):
+        """Writes all data to new snapshot which replaces old one at once, then empties journal"""
+        snapshot = dict(self.__data)
+        snapshot[self.SEQUENCE_KEY] = self.__sequence
+        write_atomically(self.__snapshotPath, json.dumps(snapshot).encode())
+
+        if self.__journal is not None:
+            self.__journal.close()
+        self.__journal = open(self.__journalPath, 'w')
+        self.__journalLength = 0
+
+    def close(self):
+        """Compacts journal into snapshot and closes journal file"""
+        self.compact()
+        self.__journal.close()
+        self.__journal = None
@@ -0,0 +1,124 @@
+import threading
+import numpy as np
+from collections import OrderedDict, deque
+from engine import create_layout
+
+
+class LayoutPool:
+    """Class which object keeps mines layouts prepared by background thread for recently used kinds of boards,
+        so that first move takes ready layout instead of sampling mines and counting neighbours"""
+
+    LAYOUTS_PER_KIND = 4
+    MEMORY_LIMIT = 64 * 2 ** 20
+
+    def __init__(self, layoutsPerKind=LAYOUTS_PER_KIND, memoryLimit=MEMORY_LIMIT):
+        self.__layoutsPerKind = layoutsPerKind
+        self.__memoryLimit = memoryLimit
+        self.__layouts = OrderedDict()  # kind -> deque of layouts, least recently used kind first
+        self.__memory = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__rng = np.random.default_rng()
+        self.__condition = threading.Condition()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__work, daemon=True)
+        self.__thread.start()
+
+    @staticmethod
+    def __get_layout_memory(layout):
+        return layout.sample.nbytes + layout.mines.nbytes + layout.minesAround.nbytes
+
+    @staticmethod
+    def __get_kind_memory(kind):
+        """Returns number of bytes taken by single layout of given kind"""
+        (rows, cols), mines, spare = kind
+        return 2 * rows * cols + np.dtype(np.intp).itemsize * (mines + spare)
+
+    def __get_wanted(self):
+        """Returns dictionary with number of layouts wanted for each kind,
+            memory limit is shared out starting from most recently used kind"""
+        wanted = {}
+        memory = self.__memoryLimit
+        for kind in reversed(self.__layouts):
+            wanted[kind] = min(self.__layoutsPerKind, memory // self.__get_kind_memory(kind))
+            memory -= wanted[kind] * self.__get_kind_memory(kind)
+        return wanted
+
+    def __get_missing_kind(self):
+        """Returns most recently used kind which has less layouts than wanted, None if all are complete"""
+        wanted = self.__get_wanted()
+        for kind in reversed(self.__layouts):
+            if len(self.__layouts[kind]) < wanted[kind]:
+                return kind
+        return None
+
+    def __evict(self):
+        """Drops layouts of least recently used kinds beyond their wanted number until memory limit is kept,
+            kinds which are left without layouts and are not wanted any more are forgotten"""
+        wanted = self.__get_wanted()
+        for kind, layouts in self.__layouts.items():
+            while len(layouts) > wanted[kind] and self.__memory > self.__memoryLimit:
+                self.__memory -= self.__get_layout_memory(layouts.popleft())
+        for kind in [kind for kind, layouts in self.__layouts.items() if not layouts and wanted[kind] == 0]:
+            del self.__layouts[kind]
+
+    def __work(self):
+        """Refills layouts of used kinds as long as pool is running"""
+        while True:
+            with self.__condition:
+                kind = self.__get_missing_kind()
+                while self.__running and kind is None:
+                    self.__condition.wait()
+                    kind = self.__get_missing_kind()
+                if not self.__running:
+                    return
+                seed = int(self.__rng.integers(2 ** 32))
+
+            size, mines, spare = kind
+            layout = create_layout(size, mines, seed, spare)
+
+            with self.__condition:
+                if kind in self.__layouts:
+                    self.__layouts[kind].append(layout)
+                    self.__memory += self.__get_layout_memory(layout)
+                    self.__evict()
+
+    def request(self, size, mines, spare):
+        """Marks kind of board as recently used so that its layouts are prepared in background"""
+        kind = size, mines, spare
+        with self.__condition:
+            if kind not in self.__layouts:
+                self.__layouts[kind] = deque()
+            self.__layouts.move_to_end(kind)
+            self.__evict()
+            self.__condition.notify()
+
+    def take(self, size, mines, spare):
+        """Returns prepared layout of given kind removing it from pool, None if there is none ready"""
+        kind = size, mines, spare
+        self.request(size, mines, spare)
+        with self.__condition:
+            layouts = self.__layouts.get(kind)
+            if not layouts:
+                self.__misses += 1
+                return None
+            self.__hits += 1
+            layout = layouts.popleft()
+            self.__memory -= self.__get_layout_memory(layout)
+            return layout
+
+    def shutdown(self):
+        """Stops background thread"""
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+        self.__thread.join()
+
+    def get_hits(self):
+        return self.__hits
+
+    def get_misses(self):
+        return self.__misses
+
+    def get_memory(self):
+        return self.__memory
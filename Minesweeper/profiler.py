@@ -0,0 +1,129 @@
+import csv
+import json
+import time
+import numpy as np
+from collections import deque
+from contextlib import contextmanager
+
+
+class FrameProfiler:
+    """Class which object measures time taken by phases of frames of main loop and counts work done in them,
+        percentiles are computed over window of recent frames, all frames are kept only if they are to be exported"""
+
+    WINDOW = 300
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, frameRate, window=WINDOW, keepAll=False):
+        self.__budget = 1000 / frameRate
+        self.__frames = deque(maxlen=window)
+        self.__allFrames = [] if keepAll else None
+        self.__times = None
+        self.__counts = None
+        self.__start = None
+        self.__framesNo = 0
+        self.__droppedNo = 0
+        self.begin_frame()
+
+    def begin_frame(self):
+        """Starts measuring new frame, work measured before first call counts into frame started by constructor"""
+        self.__times = {}
+        self.__counts = {}
+        self.__start = time.perf_counter()
+
+    @contextmanager
+    def measure(self, phase):
+        """Adds time in milliseconds spent in block of with statement to time of phase in current frame"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__times[phase] = self.__times.get(phase, 0.0) + (time.perf_counter() - start) * 1000
+
+    def count(self, name, value):
+        """Adds value to counter of given name in current frame"""
+        self.__counts[name] = self.__counts.get(name, 0) + value
+
+    def end_frame(self):
+        """Finishes measuring current frame, it is dropped if it took longer than frame rate allows"""
+        self.__times['frame'] = (time.perf_counter() - self.__start) * 1000
+        self.__framesNo += 1
+        if self.__times['frame'] > self.__budget:
+            self.__droppedNo += 1
+        frame = (self.__times, self.__counts)
+        self.__frames.append(frame)
+        if self.__allFrames is not None:
+            self.__allFrames.append(frame)
+
+    def __get_percentiles(self, frames, phase):
+        """Returns percentiles of time of phase in given frames in which it was measured, None if there are none"""
+        times = [frame[0][phase] for frame in frames if phase in frame[0]]
+        if not times:
+            return None
+        return tuple(np.percentile(times, self.PERCENTILES).tolist())
+
+    @staticmethod
+    def __get_names(frames, part):
+        """Returns names of phases or counters, depending on part, measured in given frames, whole frame first"""
+        names = dict.fromkeys(['frame']) if part == 0 else {}
+        for frame in frames:
+            names.update(dict.fromkeys(frame[part]))
+        return list(names)
+
+    def __summarize(self, frames):
+        """Returns dictionary with numbers of frames, percentiles of phases and mean counters of given frames"""
+        percentiles = {}
+        for phase in self.__get_names(frames, 0):
+            values = self.__get_percentiles(frames, phase)
+            if values is not None:
+                percentiles[phase] = dict(zip(['p{}'.format(p) for p in self.PERCENTILES], values))
+        return {
+            'budget': self.__budget,
+            'frames': len(frames),
+            'dropped': sum(frame[0]['frame'] > self.__budget for frame in frames),
+            'percentiles': percentiles,
+            'counts': {name: sum(frame[1].get(name, 0) for frame in frames) / len(frames)
+                       for name in self.__get_names(frames, 1)},
+        }
+
+    def get_percentiles(self, phase):
+        """Returns percentiles of time of phase in recent frames in which it was measured, None if there are none"""
+        return self.__get_percentiles(self.__frames, phase)
+
+    def get_phases(self):
+        """Returns names of phases measured in recent frames, whole frame first"""
+        return self.__get_names(self.__frames, 0)
+
+    def get_last_count(self, name):
+        return self.__frames[-1][1].get(name, 0) if self.__frames else 0
+
+    def get_mean_count(self, name):
+        """Returns mean value of counter in recent frames"""
+        return sum(frame[1].get(name, 0) for frame in self.__frames) / len(self.__frames) if self.__frames else 0.0
+
+    def get_summary(self):
+        """Returns dictionary with numbers of frames, percentiles of phases and mean counters of recent frames"""
+        return self.__summarize(self.__frames)
+
+    def export(self, path):
+        """Writes all measured frames to file, JSON with summary if path ends with .json and CSV otherwise"""
+        frames = self.__allFrames if self.__allFrames is not None else list(self.__frames)
+        if path.endswith('.json'):
+            with open(path, 'w') as file:
+                json.dump({'summary': self.__summarize(frames),
+                           'frames': [dict(times, **counts) for times, counts in frames]}, file)
+            return
+
+        columns = self.__get_names(frames, 0) + self.__get_names(frames, 1)
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(dict(times, **counts) for times, counts in frames)
+
+    def get_budget(self):
+        return self.__budget
+
+    def get_framesNo(self):
+        return self.__framesNo
+
+    def get_droppedNo(self):
+        return self.__droppedNo
@@ -0,0 +1,208 @@
+import math
+import struct
+import zlib
+import numpy as np
+from bisect import bisect_right
+from engine import Engine
+from state import GameState
+
+ACTIONS = ('open', 'flag', 'chord')
+
+
+def encode_varint(value, buffer):
+    """Appends non negative integer to buffer as 7 bits per byte, lowest first, highest bit marking continuation"""
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def decode_varint(data, position):
+    """Returns integer encoded by encode_varint starting at given position and position past its end"""
+    value = 0
+    shift = 0
+    while True:
+        if position >= len(data):
+            raise ValueError("Replay data is truncated")
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class Replay:
+    """Class which object keeps seed of game and moves which changed its board, so that game can be played again,
+        every move is encoded as time since previous one in milliseconds and cell combined with action,
+        each of them taking one byte for values below 128 and one byte more for each 7 bits above,
+        snapshots of opened and flagged cells taken every few moves let playback seek without repeating all moves,
+        on big boards they are taken less often so that they do not take much more space than moves"""
+
+    VERSION = 2
+    SNAPSHOT_INTERVAL = 64
+    CELLS_PER_SNAPSHOT_MOVE = 64
+    HEADER = struct.Struct('<4sBHHIQ?')
+    MAGIC = b'MSRP'
+
+    def __init__(self, size, mines, seed, safeArea):
+        self.__size = size
+        self.__mines = mines
+        self.__seed = seed
+        self.__safeArea = safeArea
+        self.__moves = []  # (milliseconds since first move, action, (row, col))
+        self.__snapshots = []  # (number of moves made before snapshot, compressed planes)
+        self.__startTime = None
+
+    def __get_snapshot_code(self):
+        """Returns code following last code of move, it marks snapshot in encoded replay"""
+        return self.__size[0] * self.__size[1] * len(ACTIONS)
+
+    @staticmethod
+    def __pack(opened, flagged):
+        """Returns bytes holding bit packed planes of opened and flagged cells"""
+        return zlib.compress(np.packbits(np.stack((opened, flagged))).tobytes())
+
+    def __unpack(self, data):
+        """Returns planes of opened and flagged cells packed by __pack"""
+        bits = np.unpackbits(np.frombuffer(zlib.decompress(data), dtype=np.uint8), count=2 * np.prod(self.__size))
+        return bits.reshape((2,) + tuple(self.__size)).astype(bool)
+
+    def record(self, time, action, index, field=None):
+        """Appends move made at given time in milliseconds, field of game after move is snapshotted if it is due"""
+        if self.__startTime is None:
+            self.__startTime = time
+        self.__moves.append((time - self.__startTime, action, (index[0], index[1])))
+        lastSnapshot = self.__snapshots[-1][0] if self.__snapshots else 0
+        interval = max(self.SNAPSHOT_INTERVAL, self.__size[0] * self.__size[1] // self.CELLS_PER_SNAPSHOT_MOVE)
+        if field is not None and len(self.__moves) - lastSnapshot >= interval:
+            self.__snapshots.append((len(self.__moves), self.__pack(*field.get_planes()[1:])))
+
+    def encode(self):
+        """Returns replay as bytes"""
+        data = bytearray(self.HEADER.pack(self.MAGIC, self.VERSION, self.__size[0], self.__size[1], self.__mines,
+                                          self.__seed, self.__safeArea))
+        previous = 0
+        cols = self.__size[1]
+        snapshots = iter(self.__snapshots)
+        snapshot = next(snapshots, None)
+        for movesNo, (time, action, (row, col)) in enumerate(self.__moves, 1):
+            encode_varint(time - previous, data)
+            encode_varint((row * cols + col) * len(ACTIONS) + ACTIONS.index(action), data)
+            previous = time
+            if snapshot is not None and snapshot[0] == movesNo:
+                encode_varint(0, data)
+                encode_varint(self.__get_snapshot_code(), data)
+                encode_varint(len(snapshot[1]), data)
+                data += snapshot[1]
+                snapshot = next(snapshots, None)
+        return bytes(data)
+
+    @staticmethod
+    def decode(data):
+        """Returns replay read from bytes made by encode, raises ValueError if they are damaged"""
+        if len(data) < Replay.HEADER.size:
+            raise ValueError("Replay data is truncated")
+        magic, version, rows, cols, mines, seed, safeArea = Replay.HEADER.unpack_from(data)
+        if magic != Replay.MAGIC or not 1 <= version <= Replay.VERSION:
+            raise ValueError("Data is not replay of supported version")
+        replay = Replay((rows, cols), mines, seed, safeArea)
+        position = Replay.HEADER.size
+        time = 0
+        while position < len(data):
+            delta, position = decode_varint(data, position)
+            code, position = decode_varint(data, position)
+            time += delta
+            if code == replay.__get_snapshot_code():
+                length, position = decode_varint(data, position)
+                if position + length > len(data):
+                    raise ValueError("Replay data is truncated")
+                replay.__snapshots.append((len(replay.__moves), data[position:position + length]))
+                position += length
+                continue
+            cell, action = divmod(code, len(ACTIONS))
+            if cell >= rows * cols:
+                raise ValueError("Replay move is outside of board")
+            replay.__moves.append((time, ACTIONS[action], divmod(cell, cols)))
+        return replay
+
+    def create_engine(self):
+        """Returns engine set up to play game of replay from its beginning"""
+        engine = Engine(self.__size, self.__mines, self.__safeArea)
+        engine.reset(seed=self.__seed)
+        return engine
+
+    def play(self, engine=None, until=None):
+        """Makes moves of replay on engine, new one if none is passed, without any drawing,
+            only moves made until given number of milliseconds since first move if it is set, returns engine"""
+        if engine is None:
+            engine = self.create_engine()
+        for time, action, index in self.__moves:
+            if until is not None and time > until:
+                break
+            getattr(engine, action)(*index)
+        return engine
+
+    def count_moves(self, time):
+        """Returns number of moves made until given number of milliseconds since first move"""
+        return bisect_right(self.__moves, time, key=lambda move: move[0])
+
+    def seek(self, time, engine=None):
+        """Returns engine, new one if none is passed, in state of game after moves made until given number
+            of milliseconds since first move, state is restored from nearest earlier snapshot
+            so that only moves made after it are repeated"""
+        if engine is None:
+            engine = Engine(self.__size, self.__mines)
+        engine.set_safeArea(self.__safeArea)
+        engine.reset(self.__size, self.__mines, self.__seed)
+        movesNo = self.count_moves(time)
+        if movesNo == 0:
+            return engine
+
+        time, action, index = self.__moves[0]
+        getattr(engine, action)(*index)  # first move places mines
+        first = 1
+        i = bisect_right(self.__snapshots, movesNo, key=lambda snapshot: snapshot[0]) - 1
+        if i >= 0:
+            first, data = self.__snapshots[i]
+            opened, flagged = self.__unpack(data)
+            engine.restore(engine.get_field().get_planes()[0], opened, flagged)
+        for time, action, index in self.__moves[first:movesNo]:
+            getattr(engine, action)(*index)
+        return engine
+
+    def get_duration(self):
+        """Returns number of milliseconds between first and last move"""
+        return self.__moves[-1][0] if self.__moves else 0
+
+    def set_startTime(self, time):
+        """Sets time in milliseconds at which first move was made, moves recorded later are counted from it"""
+        self.__startTime = time
+
+    def get_moves(self):
+        return self.__moves
+
+    def get_size(self):
+        return self.__size
+
+    def get_mines(self):
+        return self.__mines
+
+    def get_seed(self):
+        return self.__seed
+
+    def get_safeArea(self):
+        return self.__safeArea
+
+
+def verify_replay(data, time, size, mines):
+    """Checks if replay encoded in data shows game of given board size and amount of mines
+        won within given number of seconds"""
+    try:
+        replay = Replay.decode(data)
+    except ValueError:
+        return False
+    if (replay.get_size(), replay.get_mines()) != (tuple(size), mines):
+        return False
+    engine = replay.play()
+    return engine.get_status() == GameState.won and math.ceil(replay.get_duration() / 1000) <= time
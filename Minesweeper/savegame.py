@@ -0,0 +1,50 @@
+import struct
+import numpy as np
+from collections import namedtuple
+from replay import Replay
+from utilities import write_atomically
+
+SavedGame = namedtuple('SavedGame', ['size', 'mines', 'seed', 'safeArea', 'planes', 'elapsed', 'replay'])
+SavedGame.__doc__ = """Game in progress read from save file: planes of mines, opened and flagged cells,
+    milliseconds elapsed since first move and replay"""
+
+MAGIC = b'MSSG'
+VERSION = 1
+HEADER = struct.Struct('<4sBIIIQ?QI')
+
+
+def save_game(path, engine, elapsed, replay):
+    """Writes game in progress to file, each of mines, opened and flagged planes takes one bit per cell,
+        file is replaced at once so that interrupted write leaves previous one"""
+    field = engine.get_field()
+    (rows, cols), mines = field.get_size(), field.get_minesNo()
+    planes = np.packbits(np.stack(field.get_planes())).tobytes()
+    replay = replay.encode()
+    header = HEADER.pack(MAGIC, VERSION, rows, cols, mines, field.get_seed(), engine.get_safeArea(), elapsed,
+                         len(replay))
+    write_atomically(path, header + planes + replay)
+
+
+def load_game(path):
+    """Returns game read from file written by save_game, None if file is missing or damaged"""
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, rows, cols, mines, seed, safeArea, elapsed, replayLength = HEADER.unpack_from(data)
+    planesLength = (3 * rows * cols + 7) // 8
+    if magic != MAGIC or version != VERSION or len(data) != HEADER.size + planesLength + replayLength:
+        return None
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=planesLength, offset=HEADER.size),
+                         count=3 * rows * cols)
+    planes = bits.reshape(3, rows, cols).view(bool)
+    try:
+        replay = Replay.decode(data[HEADER.size + planesLength:])
+    except ValueError:
+        return None
+    if (replay.get_size(), replay.get_mines(), replay.get_seed()) != ((rows, cols), mines, seed):
+        return None
+    return SavedGame((rows, cols), mines, seed, safeArea, planes, elapsed, replay)
@@ -0,0 +1,156 @@
+import numpy as np
+from engine import ADJACENT_OFFSETS, CLOSED, FLAGGED, EXPLODED
+from state import GameState
+
+
+def spread(planes):
+    """Returns stack of boolean planes with every cell set that is adjacent to a set cell of passed stack"""
+    boardsNo, rows, cols = planes.shape
+    padded = np.zeros((boardsNo, rows + 2, cols + 2), dtype=bool)
+    padded[:, 1:-1, 1:-1] = planes
+    result = np.zeros_like(planes)
+    for rowShift, colShift in ADJACENT_OFFSETS:
+        result |= padded[:, 1 + rowShift:1 + rowShift + rows, 1 + colShift:1 + colShift + cols]
+    return result
+
+
+def count_adjacent_stacked(planes):
+    """Returns for stack of boolean planes numbers of adjacent set cells of each cell"""
+    boardsNo, rows, cols = planes.shape
+    padded = np.zeros((boardsNo, rows + 2, cols + 2), dtype=np.uint8)
+    padded[:, 1:-1, 1:-1] = planes
+    counts = np.zeros(planes.shape, dtype=np.uint8)
+    for rowShift, colShift in ADJACENT_OFFSETS:
+        counts += padded[:, 1 + rowShift:1 + rowShift + rows, 1 + colShift:1 + colShift + cols]
+    return counts
+
+
+class BatchEngine:
+    """Class which object plays many games on boards of the same size at once,
+        keeping their state in stacked arrays and applying one move per board in every step"""
+
+    OPEN = 0
+    FLAG = 1
+
+    def __init__(self, boardsNo, size, mines, safeArea=False):
+        if not 0 <= mines < size[0] * size[1]:
+            raise ValueError("Board of size {}x{} cannot hold {} mines".format(size[0], size[1], mines))
+        self.__boardsNo = boardsNo
+        self.__size = size
+        self.__minesNo = mines
+        self.__safeArea = safeArea
+        self.__rng = np.random.default_rng()
+
+        shape = (boardsNo, size[0], size[1])
+        self.__mines = np.zeros(shape, dtype=bool)
+        self.__opened = np.zeros(shape, dtype=bool)
+        self.__flagged = np.zeros(shape, dtype=bool)
+        self.__minesAround = np.zeros(shape, dtype=np.uint8)
+        self.__status = np.full(boardsNo, GameState.waiting.value, dtype=np.uint8)
+        self.__flagsLeft = np.full(boardsNo, mines, dtype=np.int32)
+
+    def __place_mines(self, boards, rows, cols):
+        """Places mines on given boards excluding cells of their first moves,
+            each board gets layout chosen uniformly at random from allowed ones"""
+        height, width = self.__size
+        keys = self.__rng.random((len(boards), height, width))
+        if self.__safeArea and height * width - 9 >= self.__minesNo:
+            for rowShift in (-1, 0, 1):
+                for colShift in (-1, 0, 1):
+                    areaRows, areaCols = rows + rowShift, cols + colShift
+                    inside = (areaRows >= 0) & (areaRows < height) & (areaCols >= 0) & (areaCols < width)
+                    keys[np.flatnonzero(inside), areaRows[inside], areaCols[inside]] = 2
+        keys[np.arange(len(boards)), rows, cols] = 2
+
+        keys = keys.reshape(len(boards), -1)
+        chosen = np.argpartition(keys, self.__minesNo - 1, axis=1)[:, :self.__minesNo] if self.__minesNo else \
+            np.empty((len(boards), 0), dtype=np.intp)
+        mines = np.zeros(keys.shape, dtype=bool)
+        np.put_along_axis(mines, chosen, True, axis=1)
+        self.__mines[boards] = mines.reshape(len(boards), height, width)
+        self.__minesAround[boards] = count_adjacent_stacked(self.__mines[boards])
+        self.__status[boards] = GameState.running.value
+
+    def __open(self, boards, rows, cols):
+        """Opens given cells of given boards together with empty regions around them"""
+        boom = self.__mines[boards, rows, cols]
+        self.__opened[boards, rows, cols] = True
+        self.__status[boards[boom]] = GameState.lost.value
+
+        boards, rows, cols = boards[~boom], rows[~boom], cols[~boom]
+        empty = self.__minesAround[boards, rows, cols] == 0
+        boards = boards[empty]
+        frontier = np.zeros((len(boards),) + self.__size, dtype=bool)
+        frontier[np.arange(len(boards)), rows[empty], cols[empty]] = True
+        while len(boards):
+            opened = self.__opened[boards]
+            grown = spread(frontier) & ~opened & ~self.__flagged[boards]
+            self.__opened[boards] = opened | grown
+            frontier = grown & (self.__minesAround[boards] == 0)
+            active = frontier.any(axis=(1, 2))
+            boards, frontier = boards[active], frontier[active]
+
+    def __flag(self, boards, rows, cols):
+        """Toggles flags on given cells of given boards if they have flags left"""
+        flagged = self.__flagged[boards, rows, cols]
+        allowed = flagged | (self.__flagsLeft[boards] > 0)
+        boards, rows, cols, flagged = boards[allowed], rows[allowed], cols[allowed], flagged[allowed]
+        self.__flagged[boards, rows, cols] = ~flagged
+        self.__flagsLeft[boards] += np.where(flagged, 1, -1)
+
+    def get_observation(self):
+        """Returns array with state of all boards as seen by player:
+            number of adjacent mines for opened cells, CLOSED, FLAGGED or EXPLODED otherwise"""
+        observation = self.__minesAround.astype(np.int8)
+        observation[~self.__opened] = CLOSED
+        observation[self.__flagged] = FLAGGED
+        observation[self.__opened & self.__mines] = EXPLODED
+        return observation
+
+    def reset(self, seed=None):
+        """Resets all boards to state before first move and returns observation,
+            seed makes mines layouts of following games reproducible"""
+        self.__rng = np.random.default_rng(seed)
+        self.__mines.fill(False)
+        self.__opened.fill(False)
+        self.__flagged.fill(False)
+        self.__minesAround.fill(0)
+        self.__status.fill(GameState.waiting.value)
+        self.__flagsLeft.fill(self.__minesNo)
+        return self.get_observation()
+
+    def step(self, actions):
+        """Applies one move per board, actions is array of (kind, row, col) rows where kind is OPEN or FLAG,
+            returns observation, rewards, array telling which games ended and dictionary with statuses"""
+        actions = np.asarray(actions)
+        kinds, rows, cols = actions[:, 0], actions[:, 1], actions[:, 2]
+        before = self.__status.copy()
+        playable = (before == GameState.waiting.value) | (before == GameState.running.value)
+        playable &= ~self.__opened[np.arange(self.__boardsNo), rows, cols]
+
+        opening = playable & (kinds == self.OPEN) & ~self.__flagged[np.arange(self.__boardsNo), rows, cols]
+        first = np.flatnonzero(opening & (before == GameState.waiting.value))
+        if len(first):
+            self.__place_mines(first, rows[first], cols[first])
+        opening = np.flatnonzero(opening)
+        self.__open(opening, rows[opening], cols[opening])
+
+        flagging = np.flatnonzero(playable & (kinds == self.FLAG) & (before == GameState.running.value))
+        self.__flag(flagging, rows[flagging], cols[flagging])
+
+        running = opening[self.__status[opening] == GameState.running.value]
+        won = running[~(~self.__opened[running] & ~self.__mines[running]).any(axis=(1, 2))]
+        self.__status[won] = GameState.won.value
+        self.__flagsLeft[won] = 0
+
+        rewards = np.zeros(self.__boardsNo, dtype=np.float32)
+        rewards[won] = 1
+        rewards[(self.__status == GameState.lost.value) & (before != GameState.lost.value)] = -1
+        done = (self.__status == GameState.won.value) | (self.__status == GameState.lost.value)
+        return self.get_observation(), rewards, done, {'status': self.__status.copy()}
+
+    def get_status(self):
+        return self.__status
+
+    def get_flagsLeft(self):
+        return self.__flagsLeft
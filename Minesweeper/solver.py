@@ -0,0 +1,451 @@
+import math
+import numpy as np
+from collections import OrderedDict
+from engine import count_adjacent
+
+
+def enumerate_arrangements(cells, constraints):
+    """Enumerates arrangements of mines on cells satisfying constraints given as pairs (cells, mines number),
+        returns dictionary mapping number of mines used to pair: number of arrangements
+        and list with number of arrangements in which each cell is mine"""
+    index = {cell: i for i, cell in enumerate(cells)}
+    cellConstraints = [[] for _ in cells]
+    needs = []
+    left = []
+    for i, (constraintCells, need) in enumerate(constraints):
+        for cell in constraintCells:
+            cellConstraints[index[cell]].append(i)
+        needs.append(need)
+        left.append(len(constraintCells))
+    placed = [0] * len(constraints)
+    assignment = [0] * len(cells)
+    results = {}
+
+    def assign(i, isMine):
+        """Sets value of cell and returns whether its constraints can still be satisfied"""
+        assignment[i] = isMine
+        valid = True
+        for c in cellConstraints[i]:
+            placed[c] += isMine
+            left[c] -= 1
+            if placed[c] > needs[c] or placed[c] + left[c] < needs[c]:
+                valid = False
+        return valid
+
+    def unassign(i, isMine):
+        for c in cellConstraints[i]:
+            placed[c] -= isMine
+            left[c] += 1
+
+    def extend(i, mines):
+        if i == len(cells):
+            count, counts = results.get(mines, (0, [0] * len(cells)))
+            results[mines] = count + 1, [total + value for total, value in zip(counts, assignment)]
+            return
+        for isMine in (0, 1):
+            if assign(i, isMine):
+                extend(i + 1, mines + isMine)
+            unassign(i, isMine)
+
+    extend(0, 0)
+    return results
+
+
+def order_cells(cells, cellConstraints, constraints):
+    """Returns indices of cells in breadth first order over cells sharing constraint,
+        starting from cell with fewest such neighbours, so that cells of each constraint come close together"""
+    neighbours = [sorted({other for c in cellConstraints[i] for other in constraints[c]} - {i})
+                  for i in range(len(cells))]
+    order = []
+    seen = [False] * len(cells)
+    for start in sorted(range(len(cells)), key=lambda i: len(neighbours[i])):
+        if seen[start]:
+            continue
+        seen[start] = True
+        queue = [start]
+        for i in queue:
+            order.append(i)
+            for other in neighbours[i]:
+                if not seen[other]:
+                    seen[other] = True
+                    queue.append(other)
+    return order
+
+
+def count_arrangements(cells, constraints):
+    """Counts arrangements of mines on cells satisfying constraints given as pairs (cells, mines number)
+        and returns them in format of enumerate_arrangements, counts are floating point numbers,
+        cells are assigned one by one and arrangements are merged by numbers of mines placed in constraints
+        which have both assigned and unassigned cells, so work grows with number of such partial sums
+        instead of number of arrangements"""
+    index = {cell: i for i, cell in enumerate(cells)}
+    localConstraints = [[index[cell] for cell in constraintCells] for constraintCells, _ in constraints]
+    needs = [need for _, need in constraints]
+    cellConstraints = [[] for _ in cells]
+    for c, constraintCells in enumerate(localConstraints):
+        for i in constraintCells:
+            cellConstraints[i].append(c)
+    left = [len(constraintCells) for constraintCells in localConstraints]
+
+    # state maps numbers of mines placed in active constraints to pair: lowest number of mines placed on
+    # assigned cells and array which rows follow numbers of mines, first column holding number of arrangements
+    # and i-th next one number of those in which i-th cell is mine
+    active = []
+    initial = np.zeros((1, len(cells) + 1))
+    initial[0, 0] = 1
+    states = {(): (0, initial)}
+
+    def merge(store, key, offset, counts):
+        if key not in store:
+            store[key] = offset, counts
+            return
+        otherOffset, otherCounts = store[key]
+        low = min(offset, otherOffset)
+        merged = np.zeros((max(offset + len(counts), otherOffset + len(otherCounts)) - low, len(cells) + 1))
+        merged[offset - low:offset - low + len(counts)] += counts
+        merged[otherOffset - low:otherOffset - low + len(otherCounts)] += otherCounts
+        store[key] = low, merged
+
+    for i in order_cells(cells, cellConstraints, localConstraints):
+        current = active + [c for c in cellConstraints[i] if c not in active]
+        for c in cellConstraints[i]:
+            left[c] -= 1
+        following = [c for c in current if left[c] > 0]
+        positions = [current.index(c) for c in following]
+        touched = [(current.index(c), needs[c], left[c]) for c in cellConstraints[i]]
+        nextStates = {}
+        for state, (offset, counts) in states.items():
+            placed = list(state) + [0] * (len(current) - len(active))
+            for isMine in (0, 1):
+                if any(not need - left_ <= placed[p] + isMine <= need for p, need, left_ in touched):
+                    continue
+                values = [placed[p] + isMine * (current[p] in cellConstraints[i]) for p in positions]
+                if isMine:
+                    mineCounts = counts.copy()
+                    mineCounts[:, i + 1] += mineCounts[:, 0]
+                    merge(nextStates, tuple(values), offset + 1, mineCounts)
+                else:
+                    merge(nextStates, tuple(values), offset, counts)
+        states = nextStates
+        active = following
+
+    results = {}
+    for offset, counts in states.values():
+        for row, rowCounts in enumerate(counts.tolist()):
+            if rowCounts[0] > 0:
+                count, cellCounts = results.get(offset + row, (0.0, [0.0] * len(cells)))
+                results[offset + row] = (count + rowCounts[0],
+                                         [total + value for total, value in zip(cellCounts, rowCounts[1:])])
+    return results
+
+
+class Solver:
+    """Class which object deduces safe cells and mines from opened numbers of field,
+        constraints are kept between moves and only ones touched by newly opened cells are evaluated again"""
+
+    SEARCH_LIMIT = 16
+    ARRANGEMENTS_CACHE_SIZE = 512
+
+    def __init__(self, field):
+        self.__field = field
+        self.__arrangements = OrderedDict()
+        self.__version = 0
+        self.__probabilities = None
+        self.__probabilitiesVersion = None
+        self.__constraints = {}
+        self.__cellConstraints = {}
+        self.__mines = set()
+        self.__safe = set()
+        self.__dirty = set()
+        self.rebuild()
+
+    def __add_constraint(self, cell):
+        """Creates constraint of opened cell: how many of its undetermined neighbours are mines"""
+        unknown = set()
+        need = self.__field.get_minesAround(cell)
+        for adjacent in self.__field.get_adjacent(cell):
+            if adjacent in self.__mines:
+                need -= 1
+            elif adjacent not in self.__safe and not self.__field.is_opened(adjacent):
+                unknown.add(adjacent)
+        if not unknown:
+            return
+        self.__constraints[cell] = [unknown, need]
+        for adjacent in unknown:
+            self.__cellConstraints.setdefault(adjacent, set()).add(cell)
+        self.__dirty.add(cell)
+
+    def __resolve(self, cell, isMine):
+        """Removes cell from all constraints after learning whether it is mine"""
+        for constraintCell in self.__cellConstraints.pop(cell, ()):
+            constraint = self.__constraints[constraintCell]
+            constraint[0].discard(cell)
+            if isMine:
+                constraint[1] -= 1
+            self.__dirty.add(constraintCell)
+
+    def __mark(self, cells, isMine):
+        """Records cells as mines or safe ones"""
+        for cell in list(cells):
+            if cell in self.__mines or cell in self.__safe:
+                continue
+            (self.__mines if isMine else self.__safe).add(cell)
+            self.__resolve(cell, isMine)
+
+    def __propagate(self):
+        """Applies single cell and subset rules to dirty constraints until nothing new can be deduced"""
+        while self.__dirty:
+            cell = self.__dirty.pop()
+            constraint = self.__constraints.get(cell)
+            if constraint is None:
+                continue
+            unknown, need = constraint
+            if not unknown:
+                del self.__constraints[cell]
+                continue
+            if need == 0:
+                self.__mark(unknown, False)
+            elif need == len(unknown):
+                self.__mark(unknown, True)
+            else:
+                self.__apply_subset_rule(cell, unknown, need)
+
+    def __apply_subset_rule(self, cell, unknown, need):
+        """Compares constraint with ones sharing its cells, if one contains the other
+            the difference of their cells holds known number of mines"""
+        others = set()
+        for unknownCell in unknown:
+            others |= self.__cellConstraints.get(unknownCell, set())
+        others.discard(cell)
+        for other in others:
+            otherUnknown, otherNeed = self.__constraints[other]
+            if unknown <= otherUnknown:
+                bigger, smaller, mines = otherUnknown, unknown, otherNeed - need
+            elif otherUnknown <= unknown:
+                bigger, smaller, mines = unknown, otherUnknown, need - otherNeed
+            else:
+                continue
+            rest = bigger - smaller
+            if rest and mines == 0:
+                self.__mark(rest, False)
+                return
+            if rest and mines == len(rest):
+                self.__mark(rest, True)
+                return
+
+    def __get_components(self):
+        """Splits undetermined cells of constraints into groups not sharing any constraint"""
+        components = []
+        seen = set()
+        for start in self.__cellConstraints:
+            if start in seen:
+                continue
+            component = []
+            stack = [start]
+            seen.add(start)
+            while stack:
+                cell = stack.pop()
+                component.append(cell)
+                for constraintCell in self.__cellConstraints[cell]:
+                    for other in self.__constraints[constraintCell][0]:
+                        if other not in seen:
+                            seen.add(other)
+                            stack.append(other)
+            components.append(component)
+        return components
+
+    def __get_arrangements(self, component):
+        """Returns cells of component in canonical order and result of enumerate_arrangements for them,
+            components above SEARCH_LIMIT are counted by count_arrangements instead,
+            results are cached by signature of component's constraints,
+            so components that did not change are not enumerated again"""
+        cells = sorted(component)
+        index = {cell: i for i, cell in enumerate(cells)}
+        constraintCells = set()
+        for cell in cells:
+            constraintCells |= self.__cellConstraints[cell]
+        signature = tuple(sorted((tuple(sorted(index[cell] for cell in self.__constraints[constraintCell][0])),
+                                  self.__constraints[constraintCell][1]) for constraintCell in constraintCells))
+
+        if signature in self.__arrangements:
+            self.__arrangements.move_to_end(signature)
+        else:
+            count = enumerate_arrangements if len(cells) <= self.SEARCH_LIMIT else count_arrangements
+            self.__arrangements[signature] = count(range(len(cells)),
+                                                   [(set(localCells), need) for localCells, need in signature])
+            if len(self.__arrangements) > self.ARRANGEMENTS_CACHE_SIZE:
+                self.__arrangements.popitem(last=False)
+        return cells, self.__arrangements[signature]
+
+    def __search(self, component):
+        """Uses all mine arrangements of component satisfying constraints
+            to mark cells being mines in all of them or in none of them"""
+        cells, arrangements = self.__get_arrangements(component)
+        solutions = 0
+        mineCounts = [0] * len(cells)
+        for count, counts in arrangements.values():
+            solutions += count
+            mineCounts = [total + cellCount for total, cellCount in zip(mineCounts, counts)]
+        if solutions == 0:
+            return False
+
+        found = False
+        for cell, count in zip(cells, mineCounts):
+            if count == 0:
+                self.__mark([cell], False)
+                found = True
+            elif count == solutions:
+                self.__mark([cell], True)
+                found = True
+        return found
+
+    def __search_small_components(self):
+        """Runs exhaustive search on components small enough, returns whether anything was deduced"""
+        found = False
+        for component in sorted(self.__get_components(), key=len):
+            if len(component) > self.SEARCH_LIMIT:
+                break
+            if self.__search(component):
+                found = True
+                self.__propagate()
+        if found:
+            self.__version += 1
+        return found
+
+    def __add_constraints(self, cells):
+        """Creates constraints of given opened cells which have closed neighbours"""
+        observation = self.__field.get_observation()
+        closedAround = count_adjacent(observation < 0)
+        boundary = cells[(closedAround[cells[:, 0], cells[:, 1]] > 0) & (observation[cells[:, 0], cells[:, 1]] >= 0)]
+        for row, col in boundary.tolist():
+            self.__add_constraint((row, col))
+
+    def rebuild(self):
+        """Forgets all deductions and builds constraints from current state of field"""
+        self.__constraints = {}
+        self.__cellConstraints = {}
+        self.__mines = set()
+        self.__safe = set()
+        self.__dirty = set()
+        self.__add_constraints(np.argwhere(self.__field.get_observation() >= 0))
+        self.__propagate()
+        self.__version += 1
+
+    def update(self, changed):
+        """Takes into account cells opened since last call, changed is array of their positions"""
+        changed = np.asarray(changed, dtype=np.intp).reshape(-1, 2)
+        for cell in map(tuple, changed.tolist()):
+            self.__safe.discard(cell)
+            self.__resolve(cell, False)
+        self.__add_constraints(changed)
+        self.__propagate()
+        self.__version += 1
+
+    def __get_pending_move(self):
+        """Returns move based on already deduced cells or None if there is none"""
+        for cell in self.__safe:
+            if not self.__field.is_flagged(cell):
+                return ('open',) + cell
+        for cell in self.__mines:
+            if not self.__field.is_flagged(cell):
+                return ('flag',) + cell
+        return None
+
+    def next_move(self):
+        """Returns certain move as tuple (kind, row, col) where kind is 'open' or 'flag',
+            None if no move can be deduced"""
+        move = self.__get_pending_move()
+        if move is None and self.__search_small_components():
+            move = self.__get_pending_move()
+        return move
+
+    @staticmethod
+    def __to_arrays(distribution):
+        """Returns lowest number of mines of result of arrangements counting, array of numbers of arrangements
+            and matrix of numbers of them in which each cell is mine, indexed by numbers of mines above lowest,
+            both divided by their greatest number of arrangements, and logarithm of that divisor"""
+        low = min(distribution)
+        totals = np.zeros(max(distribution) - low + 1)
+        counts = np.zeros((len(totals), len(next(iter(distribution.values()))[1])))
+        for mines, (count, cellCounts) in distribution.items():
+            totals[mines - low] = count
+            counts[mines - low] = cellCounts
+        top = totals.max()
+        return low, totals / top, counts / top, math.log(top)
+
+    @staticmethod
+    def __convolve(first, second):
+        """Returns distribution of summed numbers of mines of two scaled distributions as (low, array, logarithm)"""
+        values = np.convolve(first[1], second[1])
+        top = values.max()
+        return first[0] + second[0], values / top, first[2] + second[2] + math.log(top)
+
+    def __combine(self, distributions, unconstrained, minesLeft):
+        """Combines mine number distributions of independent components with cells outside of them,
+            returns mine probabilities of cells of each component and of single unconstrained cell,
+            numbers of arrangements are kept scaled with their logarithms so that they do not overflow"""
+        components = [self.__to_arrays(distribution) for distribution in distributions]
+        scaled = [(low, totals, scale) for low, totals, _, scale in components]
+        prefixes = [(0, np.ones(1), 0.0)]
+        for component in scaled:
+            prefixes.append(self.__convolve(prefixes[-1], component))
+        suffixes = [(0, np.ones(1), 0.0)]
+        for component in reversed(scaled):
+            suffixes.append(self.__convolve(suffixes[-1], component))
+        suffixes.reverse()
+
+        low, totals, scale = prefixes[-1]
+        mines = np.arange(low, low + len(totals))
+        rest = minesLeft - mines
+        possible = (rest >= 0) & (rest <= unconstrained)
+        logs = np.full(len(mines), -np.inf)
+        logs[possible] = [math.lgamma(unconstrained + 1) - math.lgamma(value + 1)
+                          - math.lgamma(unconstrained - value + 1) for value in rest[possible].tolist()]
+        weights = np.exp(logs - logs.max())  # ways to place remaining mines on unconstrained cells
+        whole = float(np.dot(totals, weights))
+
+        probabilities = []
+        for i, (_, _, counts, componentScale) in enumerate(components):
+            others = self.__convolve(prefixes[i], suffixes[i + 1])
+            factors = np.correlate(weights, others[1], 'valid')
+            cellWeights = factors @ counts * math.exp(others[2] + componentScale - scale)
+            probabilities.append((cellWeights / whole).tolist())
+
+        other = None
+        if unconstrained:
+            expected = float(np.dot(totals * weights, rest))
+            other = min(max(expected / whole / unconstrained, 0.0), 1.0)
+        return probabilities, other
+
+    def get_probabilities(self):
+        """Returns dictionary with exact mine probability of each closed cell adjacent to opened number
+            and probability shared by all remaining closed cells, results are kept until board changes"""
+        if self.__probabilitiesVersion == self.__version:
+            return self.__probabilities
+
+        probabilities = {cell: 0.0 for cell in self.__safe}
+        probabilities.update({cell: 1.0 for cell in self.__mines})
+        arrangements = [self.__get_arrangements(component) for component in self.__get_components()]
+        closed = int(np.count_nonzero(self.__field.get_observation() < 0))
+        unconstrained = closed - len(probabilities) - sum(len(cells) for cells, _ in arrangements)
+        minesLeft = self.__field.get_minesNo() - len(self.__mines)
+        componentProbabilities, other = self.__combine([result for _, result in arrangements],
+                                                       unconstrained, minesLeft)
+        for (cells, _), cellProbabilities in zip(arrangements, componentProbabilities):
+            probabilities.update(zip(cells, cellProbabilities))
+
+        self.__probabilities = probabilities, other
+        self.__probabilitiesVersion = self.__version
+        return self.__probabilities
+
+    def get_version(self):
+        return self.__version
+
+    def get_safe(self):
+        return self.__safe
+
+    def get_mines(self):
+        return self.__mines
+
+    def get_constraints(self):
+        return self.__constraints
@@ -15,3 +15,13 @@ class WindowMode(enum.Enum):
     leaderboard = 1
     entry = 2
     delete = 3
+
+
+class BoardEvent(enum.Enum):
+    """Enumeration to depict events resulting from moves made on board"""
+    started = 0
+    opened = 1
+    flagged = 2
+    unflagged = 3
+    exploded = 4
+    won = 5
@@ -1,48 +1,33 @@
 class Tile:
-    """Class responsible for depicting state of singular board tile"""
+    """Class responsible for depicting state of singular board tile,
+        it is a view onto cell of given position in field owning the actual state"""
     def __init__(self, owner, position):
-        self.__isMine = False
-        self.__isClicked = False
-        self.__isFlagged = False
         self.__position = position
-        self.__adjacentTiles = []
-        self.__minesAroundNo = 0
         self.__owner = owner
 
-    def __set_minesAroundNo(self):
-        mines = 0
-        for tile in self.__adjacentTiles:
-            if tile.is_mine():
-                mines += 1
-        self.__minesAroundNo = mines
-
     def is_mine(self):
-        return self.__isMine
+        return self.__owner.is_mine(self.__position)
 
     def set_mine(self):
-        self.__isMine = True
+        self.__owner.set_mines([self.__position])
 
     def is_clicked(self):
-        return self.__isClicked
+        return self.__owner.is_opened(self.__position)
 
     def is_flagged(self):
-        return self.__isFlagged
-
-    def set_adjacentTiles(self, adjacent):
-        self.__adjacentTiles = adjacent
-        self.__set_minesAroundNo()
+        return self.__owner.is_flagged(self.__position)
 
     def get_adjacentTiles(self):
-        return self.__adjacentTiles
+        return [Tile(self.__owner, position) for position in self.__owner.get_adjacent(self.__position)]
 
     def get_position(self):
         return self.__position
 
     def get_minesAroundNo(self):
-        return self.__minesAroundNo
+        return self.__owner.get_minesAround(self.__position)
 
     def toggle_flag(self):
-        self.__isFlagged = not self.__isFlagged
+        self.__owner.toggle_flag(self.__position)
 
     def click(self):
-        self.__isClicked = True
+        self.__owner.open(self.__position)
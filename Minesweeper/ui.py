@@ -1,7 +1,48 @@
+import math
 import pygame
+from collections import OrderedDict
 from utilities import draw_frame, draw_checked_box, check_entry_key
 
 
+class TextCache:
+    """Class which object keeps pictures of rendered texts shared by all widgets,
+        least recently used ones are forgotten once their number exceeds limit"""
+
+    SIZE_LIMIT = 512
+
+    def __init__(self, sizeLimit=SIZE_LIMIT):
+        self.__sizeLimit = sizeLimit
+        self.__renders = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        """Returns picture of text rendered with given font and colour, it must not be drawn onto"""
+        key = font, text, tuple(pygame.Color(color)), antialias
+        if key in self.__renders:
+            self.__hits += 1
+            self.__renders.move_to_end(key)
+            return self.__renders[key]
+        self.__misses += 1
+        self.__renders[key] = font.render(text, antialias, color)
+        if len(self.__renders) > self.__sizeLimit:
+            self.__renders.popitem(last=False)
+        return self.__renders[key]
+
+    def get_hits(self):
+        return self.__hits
+
+    def get_misses(self):
+        return self.__misses
+
+    def get_hitRate(self):
+        requests = self.__hits + self.__misses
+        return self.__hits / requests if requests else 0.0
+
+
+TEXT_CACHE = TextCache()
+
+
 class Element:
     """Base class to represent graphical element, contains surface and rectangle"""
     def __init__(self, surface):
@@ -19,50 +60,45 @@ class Element:
 
 
 class Counter(Element):
-    """Class to  represent counter"""
-    def __init__(self, surface, values, owner):
-        super().__init__(surface)
-        self.__values = values
-        self.__owner = owner
+    """Class to represent counter showing integer value with given minimal number of digits,
+        pictures of shown values are kept so that changing value only swaps surfaces"""
+
+    RENDERS_LIMIT = 32
 
-    def update_display(self):
-        for i, number in enumerate(self.__values):
-            self._surface.blit(self.__owner.get_icons()['timer_{}'.format(str(number))],
-                               (0 + (self.__owner.TIMER_DIG_WIDTH * i), 0))
-
-    def increment(self):
-        if self.__values[2] < 9:
-            self.__values[2] += 1
-        elif self.__values[1] < 9:
-            self.__values[1] += 1
-            self.__values[2] = 0
-        elif self.__values[0] < 9:
-            self.__values[0] += 1
-            self.__values[1] = 0
-            self.__values[2] = 0
-
-    def decrement(self):
-        if self.__values[2] > 0:
-            self.__values[2] -= 1
-        elif self.__values[1] > 0:
-            self.__values[1] -= 1
-            self.__values[2] = 9
-        elif self.__values[0] > 0:
-            self.__values[0] -= 1
-            self.__values[1] = 9
-            self.__values[2] = 9
+    def __init__(self, digitsNo, owner, value=0):
+        super().__init__(pygame.Surface((digitsNo * owner.TIMER_DIG_WIDTH, owner.TIMER_DIG_HEIGHT)))
+        self.__digitsNo = digitsNo
+        self.__owner = owner
+        self.__renders = OrderedDict()
+        self.__value = None
+        self.set_value(value)
+
+    def __render(self, value):
+        """Returns picture of value, creating it at first use and forgetting least recently used ones over limit"""
+        if value in self.__renders:
+            self.__renders.move_to_end(value)
+            return self.__renders[value]
+        surface = pygame.Surface(self._rect.size)
+        icons = self.__owner.get_icons()
+        surface.blits([(icons['timer_{}'.format(character)], (self.__owner.TIMER_DIG_WIDTH * i, 0))
+                       for i, character in enumerate('{:0{}d}'.format(value, self.__digitsNo))], False)
+        self.__renders[value] = surface
+        if len(self.__renders) > self.RENDERS_LIMIT:
+            self.__renders.popitem(last=False)
+        return surface
 
     def get_value(self):
-        value = self.__values[0] * 100
-        value += self.__values[1] * 10
-        value += self.__values[2]
-        return value
+        return self.__value
 
     def set_value(self, aim):
-        while aim > self.get_value():
-            self.increment()
-        while self.get_value() > aim:
-            self.decrement()
+        """Shows smallest integer not less than aim, limited to values fitting in counter digits,
+            returns whether shown value has changed"""
+        value = min(max(math.ceil(aim), 1 - 10 ** (self.__digitsNo - 1)), 10 ** self.__digitsNo - 1)
+        if value == self.__value:
+            return False
+        self.__value = value
+        self._surface = self.__render(value)
+        return True
 
 
 class ImageButton(Element):
@@ -78,8 +114,7 @@ class ImageButton(Element):
             return
 
         if self._rect.collidepoint(*pygame.mouse.get_pos()):
-            if self.__owner.is_sound_on():
-                self.__owner.get_sounds()['sound_button'].play()
+            self.__owner.play_sound('sound_button')
             self.__action()
 
 
@@ -88,7 +123,7 @@ class TextButton(Element):
     def __init__(self, font, color, text, action, owner):
         self.__action = action
         self.__owner = owner
-        text = font.render(text, True, color)
+        text = TEXT_CACHE.render(font, text, color)
         margin = 1.5 * font.size("_")[0]
         surface = draw_frame(text.get_width() + margin, 1.2 * text.get_height(), color, pygame.Color(0, 0, 0))
 
@@ -103,8 +138,7 @@ class TextButton(Element):
             return
 
         if self._rect.collidepoint(*pygame.mouse.get_pos()):
-            if self.__owner.is_sound_on():
-                self.__owner.get_sounds()['sound_button'].play()
+            self.__owner.play_sound('sound_button')
             self.__action()
 
 
@@ -122,7 +156,7 @@ class CheckBoxSelector(Element):
                 self.__selected = i
                 break
 
-        optionNames = [font.render(option, True, fontColor) for option in options]
+        optionNames = [TEXT_CACHE.render(font, option, fontColor) for option in options]
         namesWidths = [1.5 * boxEdgeLen + name.get_width() for name in optionNames]
         width = max(namesWidths)
         height = boxEdgeLen * (2 * len(optionNames) - 2)
@@ -182,15 +216,15 @@ class CheckBoxSelector(Element):
 
 
 class Leaderboard(Element):
-    """Class to represent leaderboard"""
-    def __init__(self, titleFont, entryFont, fontColor, backgroundColor, icon, entryLimit, width, data):
+    """Class to represent leaderboard, its entries are read from game history"""
+    def __init__(self, titleFont, entryFont, fontColor, backgroundColor, icon, entryLimit, width, history):
         self.__font = titleFont
         self.__entryFont = entryFont
         self.__fontColor = fontColor
         self.__backgroundColor = backgroundColor
         self.__icon = icon
         self.__entryLimit = entryLimit
-        self.__data = data
+        self.__history = history
 
         textHeight = titleFont.get_height()
 
@@ -204,12 +238,14 @@ class Leaderboard(Element):
         super().__init__(pygame.Surface((self.__width, self.__height), pygame.SRCALPHA))
         self._rect = self._surface.get_rect()
 
-        self.__title = titleFont.render("LEADERBOARD", True, fontColor)
-        self.__beginnerHeader = titleFont.render("BEGINNER", True, fontColor)
-        self.__intermediateHeader = titleFont.render("INTERMEDIATE", True, fontColor)
-        self.__advancedHeader = titleFont.render("ADVANCED", True, fontColor)
+        self.__title = TEXT_CACHE.render(titleFont, "LEADERBOARD", fontColor)
+        self.__beginnerHeader = TEXT_CACHE.render(titleFont, "BEGINNER", fontColor)
+        self.__intermediateHeader = TEXT_CACHE.render(titleFont, "INTERMEDIATE", fontColor)
+        self.__advancedHeader = TEXT_CACHE.render(titleFont, "ADVANCED", fontColor)
         self.__entryStartHeight = (2 * self.__yGap + 3 * textHeight)
 
+        self.__draw_lanes()
+        self.__lanes = self._surface.copy()
         self.fill_lanes()
 
     def __draw_lanes(self):
@@ -253,51 +289,35 @@ class Leaderboard(Element):
         self._surface.blit(self.__icon, rightIconRect)
 
     def fill_lanes(self):
-        """Populates leaderboard with contents of data dictionary"""
-        self.__draw_lanes()
+        """Populates leaderboard with fastest named victories of each difficulty"""
+        self._surface = self.__lanes.copy()
         xName = self.__xGap
         xTime = self.__laneWidth - self.__xGap
         for difficulty in ['BEGINNER', 'INTERMEDIATE', 'ADVANCED']:
             y = self.__entryStartHeight
-            for name, time in self.__data[difficulty]:
-                drawnName = self.__entryFont.render(name, True, self.__fontColor)
-                drawnTime = self.__entryFont.render(str(time), True, self.__fontColor)
-                timeWidth = self.__entryFont.size(str(time))[0]
+            for name, time in self.__history.get_top(difficulty, self.__entryLimit):
+                drawnName = TEXT_CACHE.render(self.__entryFont, name, self.__fontColor)
+                drawnTime = TEXT_CACHE.render(self.__entryFont, str(time), self.__fontColor)
                 self._surface.blit(drawnName, (xName, y))
-                self._surface.blit(drawnTime, (xTime - timeWidth, y))
+                self._surface.blit(drawnTime, (xTime - drawnTime.get_width(), y))
                 y += self.__entryFont.get_height() + self.__yGap
 
             xName += self.__laneWidth
             xTime += self.__laneWidth
 
     def needs_update(self, difficulty, time):
-        """Checks if time passed as argument is good enough
-            to be put in provided difficulty category in data dictionary"""
-        data = self.__data[difficulty]
-        if len(data) < self.__entryLimit:
+        """Checks if time passed as argument is good enough to be put in provided difficulty category"""
+        top = self.__history.get_top(difficulty, self.__entryLimit)
+        if len(top) < self.__entryLimit:
             return True
 
-        return data[-1][1] > time
-
-    def update(self, difficulty, name, time):
-        """Places new entry = (name, time) into provided difficulty category in data dictionary"""
-        data = self.__data[difficulty]
-        i = 0
-        while i < len(data) and time >= data[i][1]:
-            i += 1
-        data.insert(i, (name, time))
-
-        if len(data) > self.__entryLimit:
-            data.pop()
+        return top[-1][1] > time
 
+    def update(self, gameId, name):
+        """Assigns name to game stored in history and shows it if it is among fastest ones"""
+        self.__history.set_player(gameId, name)
         self.fill_lanes()
 
-    def get_data(self):
-        return self.__data
-
-    def set_data(self, newData):
-        self.__data = newData
-
 
 class InputFrame(Element):
     """Class to create frame with place for user to input data from keyboard"""
@@ -305,7 +325,7 @@ class InputFrame(Element):
         self.__font = font
         self.__fontColor = fontColor
         self.__backgroundColor = backgroundColor
-        self.__drawnMessage = font.render(message, True, fontColor)
+        self.__drawnMessage = TEXT_CACHE.render(font, message, fontColor)
         self.__charactersLimit = charactersLimit
         self.__action = action
         self.__input = ""
@@ -321,14 +341,14 @@ class InputFrame(Element):
         self._rect = self._surface.get_rect()
 
         self.__valueTop = 2 * yGap + font.get_height()
+        self.__frame = draw_frame(width, height, fontColor, backgroundColor)
+        self.__frame.blit(self.__drawnMessage, self.__drawnMessageRect)
         self.__prepare()
 
     def __prepare(self):
         """Prepares frame to be drawn"""
-        self._surface = draw_frame(self._surface.get_size()[0], self._surface.get_size()[1],
-                                   self.__fontColor, self.__backgroundColor)
-        self._surface.blit(self.__drawnMessage, self.__drawnMessageRect)
-        drawnInput = self.__font.render(self.__input + "_", True, self.__fontColor)
+        self._surface = self.__frame.copy()
+        drawnInput = TEXT_CACHE.render(self.__font, self.__input + "_", self.__fontColor)
         rect = drawnInput.get_rect(top=self.__valueTop, centerx=0.5 * self._surface.get_width())
         self._surface.blit(drawnInput, rect)
 
@@ -372,7 +392,7 @@ class Popup(Element):
         self.__renderedLines = []
 
         for line in lines:
-            self.__renderedLines.append(font.render(line, True, fontColor))
+            self.__renderedLines.append(TEXT_CACHE.render(font, line, fontColor))
 
         self.__width = max(map(lambda l: l.get_width(), self.__renderedLines)) + icon.get_width() + 3 * self.__xGap
         self.__height = max(icon.get_height(), len(lines) * (font.get_height() + self.__yGap)) + 3 * self.__yGap \
@@ -408,3 +428,58 @@ class Popup(Element):
 
         self.__buttonConfirm.handle_mouse_up(button)
         self.__buttonDeny.handle_mouse_up(button)
+
+
+class Scrubber(Element):
+    """Class to represent bar showing progress of replay, pressing or dragging mouse on it seeks replay,
+        positions reached while dragging are gathered and only the last one is passed to action"""
+    def __init__(self, width, height, color, backgroundColor, action):
+        super().__init__(pygame.Surface((width, height)))
+        self.__color = color
+        self.__backgroundColor = backgroundColor
+        self.__action = action
+        self.__filled = None
+        self.__dragging = False
+        self.__target = None
+        self.set_progress(0)
+
+    def set_progress(self, fraction):
+        """Shows given fraction of bar as filled, returns whether its picture has changed"""
+        filled = round(min(max(fraction, 0), 1) * self._rect.width)
+        if filled == self.__filled:
+            return False
+        self.__filled = filled
+        self._surface.fill(self.__backgroundColor)
+        self._surface.fill(self.__color, (0, 0, filled, self._rect.height))
+        pygame.draw.rect(self._surface, self.__color, self._surface.get_rect(), 1)
+        return True
+
+    def __aim(self):
+        """Remembers fraction of bar pointed by mouse cursor"""
+        self.__target = min(max((pygame.mouse.get_pos()[0] - self._rect.left) / self._rect.width, 0), 1)
+
+    def handle_mouse_down(self, button):
+        """Handles event of mouse button being pressed down"""
+        if button == 1 and self._rect.collidepoint(*pygame.mouse.get_pos()):  # LMB
+            self.__dragging = True
+            self.__aim()
+
+    def handle_mouse_motion(self):
+        """Handles event of mouse being moved"""
+        if self.__dragging:
+            self.__aim()
+
+    def handle_mouse_up(self, button):
+        """Handles event of mouse button being let go from pressed state"""
+        if button == 1 and self.__dragging:  # LMB
+            self.__dragging = False
+            self.__aim()
+
+    def flush(self):
+        """Passes fraction of bar aimed at since previous call to action"""
+        if self.__target is not None:
+            target, self.__target = self.__target, None
+            self.__action(target)
+
+    def is_dragging(self):
+        return self.__dragging
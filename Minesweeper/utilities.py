@@ -21,6 +21,27 @@ def create_background(rows, cols, tileSize, bgColor, lineColor):
     return field
 
 
+def create_tile_atlas(icons, tileSize, bgColor, lineColor):
+    """Creates and returns surface with passed icons placed side by side over background of single tile,
+        i-th icon occupies square starting at i * tileSize"""
+    tile = create_background(1, 1, tileSize, bgColor, lineColor)
+    atlas = pygame.Surface((len(icons) * tileSize, tileSize))
+    for i, icon in enumerate(icons):
+        atlas.blit(tile, (i * tileSize, 0))
+        atlas.blit(icon, (i * tileSize, 0))
+    return atlas.convert()
+
+
+def create_minus_digit(eight, zero):
+    """Creates and returns counter digit picture of minus sign made of segment that differs digit eight from zero"""
+    eightPixels = pygame.surfarray.array3d(eight)
+    segment = (eightPixels != pygame.surfarray.array3d(zero)).any(axis=2)
+    pixels = pygame.surfarray.array3d(zero)
+    pixels[:] = eightPixels[~segment].min(axis=0) if (~segment).any() else 0
+    pixels[segment] = eightPixels[segment]
+    return pygame.surfarray.make_surface(pixels)
+
+
 def draw_frame(width, height, lineColor, backgroundColor=None):
     """Creates and returns frame (pygame.Surface) of given size optionally filled with solid color"""
     frame = pygame.Surface((width, height), pygame.SRCALPHA)
@@ -60,12 +81,22 @@ def unload_game_data(dataFilePath):
     return data
 
 
-def load_sounds():
-    """Creates and returns dictionary based on contents of directory ot given path"""
-    sounds = {}
-    for fileName in os.listdir("assets/sounds"):
-        if not fileName.endswith(".wav"):
-            continue
-        sound = pygame.mixer.Sound("assets/sounds/" + fileName)
-        sounds[fileName.split('.')[0]] = sound
-    return sounds
+def write_atomically(path, data):
+    """Writes bytes to file of given path through temporary file forced to disk and renamed over it,
+        so that interrupted write leaves previous file whole"""
+    temporaryPath = path + '.tmp'
+    with open(temporaryPath, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporaryPath, path)
+    try:
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return  # system does not allow to open directories
+    try:
+        os.fsync(directory)
+    except OSError:
+        pass
+    finally:
+        os.close(directory)